@@ -1,11 +1,13 @@
+import hashlib
 import time
 import jwt
 import os
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 
 from backend.supabase import supabase
 
@@ -23,9 +25,39 @@ def get_current_user(request: Request) -> dict:
     return user
 
 
-def verify_access_token(request):
-    authorization = request.headers.get("Authorization")
+# Decoded claims keyed by a hash of the token, kept until the token's exp so
+# repeat requests with the same token skip the HS256 verification.
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "4096"))
+_token_cache = OrderedDict()
 
+
+def decode_access_token(access_token: str) -> dict:
+    token_hash = hashlib.sha256(access_token.encode()).digest()
+    cached = _token_cache.get(token_hash)
+    if cached is not None:
+        expires_at, payload = cached
+        if expires_at > time.time():
+            _token_cache.move_to_end(token_hash)
+            return payload
+        del _token_cache[token_hash]
+
+    claims = jwt.decode(
+        access_token,
+        key=SUPABASE_JWT_SECRET,
+        do_verify=True,
+        algorithms=["HS256"],
+        audience="authenticated",
+    )
+    payload = claims["user_metadata"]
+
+    if "exp" in claims:
+        _token_cache[token_hash] = (claims["exp"], payload)
+        while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.popitem(last=False)
+    return payload
+
+
+def verify_access_token(authorization):
     if not authorization:
         return None
 
@@ -33,33 +65,40 @@ def verify_access_token(request):
 
     if access_token:
         try:
-            payload = jwt.decode(
-                access_token,
-                key=SUPABASE_JWT_SECRET,
-                do_verify=True,
-                algorithms=["HS256"],
-                audience="authenticated",
-            )["user_metadata"]
-            return payload
+            return decode_access_token(access_token)
         except:
             return None
 
     return None
 
 
-# https://medium.com/@chandanp20k/leveraging-custom-middleware-in-python-fastapi-for-enhanced-web-development-09ba72b5ddc6
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        try:
-            # Call the verify_access_token function to validate the token
-            user = verify_access_token(request)
+class AuthMiddleware:
+    """
+    Pure ASGI middleware that stores the caller's token claims on request.state.user.
+
+    Only API requests are inspected, so static files from DIST_PATH pass
+    straight through. Requests without an Authorization header skip token
+    decoding entirely.
+    """
 
-            # If token validation succeeds, continue to the next middleware or route handler
-            request.state.user = user
+    def __init__(self, app, path_prefix: str = "/api"):
+        self.app = app
+        self.path_prefix = path_prefix
 
-            response = await call_next(request)
-            return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
 
+        try:
+            # Call the verify_access_token function to validate the token
+            user = verify_access_token(Headers(scope=scope).get("authorization"))
         except Exception as e:
             # If token validation fails due to other exceptions, return a generic error response
-            return JSONResponse(content={"detail": f"Error: {str(e)}"}, status_code=500)
+            response = JSONResponse(content={"detail": f"Error: {str(e)}"}, status_code=500)
+            await response(scope, receive, send)
+            return
+
+        # If token validation succeeds, continue to the next middleware or route handler
+        scope.setdefault("state", {})["user"] = user
+        await self.app(scope, receive, send)
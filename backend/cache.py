@@ -0,0 +1,126 @@
+"""
+Response cache for the hot read endpoints.
+
+Entries live for CACHE_TTL_SECONDS. By default they are kept in-process in an
+LRU bounded by CACHE_MAX_ENTRIES. Setting CACHE_REDIS_URL stores them in Redis
+instead, so every worker shares the same entries and the same invalidations.
+Write handlers invalidate the keys they touch, so the TTL only bounds
+staleness for changes made outside the API (e.g. the listener).
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+
+class MemoryBackend:
+    """Per-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [key for key in self.entries if key.startswith(prefix)]:
+            del self.entries[key]
+
+
+class RedisBackend:
+    """Shared backend for multi-worker deployments. Needs the redis package."""
+
+    def __init__(self, url: str, namespace: str = "reuse:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.namespace = namespace
+
+    async def get(self, key):
+        raw = await self.redis.get(self.namespace + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key, value, ttl: float):
+        await self.redis.set(
+            self.namespace + key, json.dumps(value, default=str), px=int(ttl * 1000))
+
+    async def delete(self, *keys):
+        if keys:
+            await self.redis.delete(*(self.namespace + key for key in keys))
+
+    async def delete_prefix(self, prefix: str):
+        keys = [key async for key in self.redis.scan_iter(
+            match=self.namespace + prefix + "*")]
+        if keys:
+            await self.redis.delete(*keys)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: str, loader):
+        """Return the cached value for key, or await loader() and cache its result."""
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await loader()
+        await self.backend.set(key, value, self.ttl)
+        return value
+
+    async def invalidate(self, *keys: str):
+        await self.backend.delete(*keys)
+
+    async def invalidate_prefix(self, *prefixes: str):
+        for prefix in prefixes:
+            await self.backend.delete_prefix(prefix)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _make_backend():
+    if CACHE_REDIS_URL:
+        return RedisBackend(CACHE_REDIS_URL)
+    return MemoryBackend(CACHE_MAX_ENTRIES)
+
+
+cache = ResponseCache(_make_backend(), CACHE_TTL_SECONDS)
@@ -0,0 +1,154 @@
+"""
+In-process fan-out of item and bid events to ``/events`` subscribers.
+
+Write handlers call ``event_broker.publish``; each open ``/events`` stream
+holds a ``Subscription`` with a small bounded queue. Subscriptions filtered
+to particular items are indexed by item id, so publishing only touches the
+subscribers that want the event, and an idle subscriber costs one parked
+coroutine and a heartbeat comment every EVENTS_HEARTBEAT_SECONDS.
+
+A subscriber that falls EVENTS_QUEUE_SIZE events behind is dropped rather
+than buffered without bound. It receives a final ``lagged`` event and
+should refetch and reconnect.
+
+Events only reach subscribers connected to the same worker process.
+"""
+import asyncio
+import itertools
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "10000"))
+
+EVENT_TYPES = ("item-created", "bid-created", "bid-cancelled", "bid-accepted")
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    data: dict
+    item_id: Optional[str] = None
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class Subscription:
+    def __init__(self, item_ids: Optional[frozenset], types: Optional[frozenset], queue_size: int):
+        self.item_ids = item_ids
+        self.types = types
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.active = True
+        self.lagged = False
+
+    def wants(self, event: Event) -> bool:
+        return self.types is None or event.type in self.types
+
+
+class EventBroker:
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, heartbeat: float = EVENTS_HEARTBEAT_SECONDS,
+                 max_subscribers: int = EVENTS_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.ids = itertools.count(1)
+        # Subscribers to every item, and subscribers by the item ids they follow.
+        self.everything = set()
+        self.by_item = defaultdict(set)
+        self.count = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, item_ids: Optional[Iterable[str]] = None,
+                  types: Optional[Iterable[str]] = None) -> Subscription:
+        if self.count >= self.max_subscribers:
+            raise RuntimeError("Too many event subscribers, try again later.")
+        if types is not None:
+            types = frozenset(types)
+            unknown = types - set(EVENT_TYPES)
+            if unknown:
+                raise ValueError(f"Unknown event types: {', '.join(sorted(unknown))}.")
+        item_ids = frozenset(item_ids) if item_ids else None
+
+        subscription = Subscription(item_ids, types, self.queue_size)
+        if item_ids is None:
+            self.everything.add(subscription)
+        else:
+            for item_id in item_ids:
+                self.by_item[item_id].add(subscription)
+        self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if not subscription.active:
+            return
+        subscription.active = False
+        if subscription.item_ids is None:
+            self.everything.discard(subscription)
+        else:
+            for item_id in subscription.item_ids:
+                subscribers = self.by_item.get(item_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.by_item[item_id]
+        self.count -= 1
+
+    def publish(self, event_type: str, data: dict, item_id: Optional[str] = None):
+        """Queue an event for every interested subscriber. Must run on the event loop."""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}.")
+        event = Event(next(self.ids), event_type, data, item_id)
+        self.published += 1
+
+        subscribers = self.everything
+        if item_id is not None and item_id in self.by_item:
+            subscribers = subscribers | self.by_item[item_id]
+        for subscription in list(subscribers):
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.lagged = True
+                self.dropped += 1
+                self.unsubscribe(subscription)
+
+    async def stream(self, subscription: Subscription) -> AsyncIterator[str]:
+        """Server-sent events for one subscription, ending it when the client goes away."""
+        try:
+            # Reconnect quickly after a dropped connection.
+            yield "retry: 3000\n\n"
+            while True:
+                if subscription.lagged and subscription.queue.empty():
+                    yield "event: lagged\ndata: {}\n\n"
+                    return
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle stream.
+                    yield ": heartbeat\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.count,
+            "followed_items": len(self.by_item),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+event_broker = EventBroker()
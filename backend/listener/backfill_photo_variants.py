@@ -0,0 +1,125 @@
+"""
+Backfill items.photo_variants for items stored before variants existed.
+
+Walks the items table oldest first, keyset-paged by (created_at, id). Each
+photo whose variant map is missing a size is downloaded, resized in the
+listener's process pool and uploaded through the same store_image path as
+new attachments, so photos shared between items are only processed once.
+Progress is checkpointed after every item, so an interrupted run resumes
+where it stopped; --restart walks the whole table again, skipping items
+that are already complete. BACKFILL_ITEMS_PER_SECOND caps the pace.
+
+    python backfill_photo_variants.py [--restart]
+"""
+import json
+import os
+import sys
+import time
+import requests
+from dotenv import load_dotenv
+from disk_cache import CACHE_DIR
+from keyset import after_key
+from limits import limit
+from mailman_sessions import retry_policy
+from utils import supabase, store_image
+import images
+from photo_index import photo_index
+
+load_dotenv()
+
+BACKFILL_ITEMS_PER_SECOND = float(os.getenv("BACKFILL_ITEMS_PER_SECOND", "2"))
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "100"))
+BACKFILL_TIMEOUT_SECONDS = float(os.getenv("BACKFILL_TIMEOUT_SECONDS", "30"))
+BACKFILL_CHECKPOINT_PATH = os.path.join(CACHE_DIR, "backfill_photo_variants.json")
+
+WANTED = {name for name, _ in images.IMAGE_VARIANTS}
+
+
+def load_cursor():
+    if not os.path.exists(BACKFILL_CHECKPOINT_PATH):
+        return None
+    with open(BACKFILL_CHECKPOINT_PATH) as f:
+        return json.load(f).get("cursor")
+
+
+def save_cursor(cursor):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write then rename so a crash never leaves a half-written file.
+    temp_path = BACKFILL_CHECKPOINT_PATH + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"cursor": cursor}, f)
+    os.replace(temp_path, BACKFILL_CHECKPOINT_PATH)
+
+
+def item_pages(cursor):
+    """Yield pages of items after cursor, oldest first."""
+    while True:
+        query = supabase.table("items").select(
+            "id, created_at, photo_urls, photo_variants").order("created_at").order("id")
+        if cursor:
+            query = after_key(query, *cursor, desc=False)
+        with limit("supabase"):
+            rows = query.limit(BACKFILL_PAGE_SIZE).execute().data
+        if not rows:
+            return
+        yield rows
+        cursor = [rows[-1]["created_at"], rows[-1]["id"]]
+
+
+def photo_variants(url: str) -> dict:
+    """{variant name: public url} for one photo, making any missing variants."""
+    with limit("supabase"):
+        response = retry_policy.call(
+            lambda: requests.get(url, timeout=BACKFILL_TIMEOUT_SECONDS))
+    response.raise_for_status()
+    _, variants = store_image(response.content)
+    bucket = supabase.storage.from_('item_photos')
+    return {name: bucket.get_public_url(path) for name, path in variants.items()}
+
+
+def backfill_item(item) -> bool:
+    """Fill in the item's missing variants; return whether it needed any."""
+    photo_urls = item["photo_urls"] or []
+    variants = list(item["photo_variants"] or [])
+    variants += [{}] * (len(photo_urls) - len(variants))
+    variants = variants[:len(photo_urls)]
+    missing = [index for index, variant in enumerate(variants) if not WANTED <= set(variant)]
+    if not missing:
+        return False
+
+    for index in missing:
+        try:
+            variants[index] = photo_variants(photo_urls[index])
+        except Exception as e:
+            # The rest of the item still gets its sizes; a --restart run retries this one.
+            print(f"Failed to make variants of {photo_urls[index]}: {e}")
+    with limit("supabase"):
+        supabase.table("items").update(
+            {"photo_variants": variants}).eq("id", item["id"]).execute()
+    return True
+
+
+def backfill(restart=False):
+    cursor = None if restart else load_cursor()
+    interval = 1 / BACKFILL_ITEMS_PER_SECOND
+    next_start = time.monotonic()
+    updated = 0
+
+    for rows in item_pages(cursor):
+        for item in rows:
+            if backfill_item(item):
+                updated += 1
+                # Only items that did work count against the rate.
+                time.sleep(max(0.0, next_start - time.monotonic()))
+                next_start = max(next_start, time.monotonic()) + interval
+            save_cursor([item["created_at"], item["id"]])
+        print(f"Backfilled {updated} items so far.")
+
+    print(f"Done: backfilled {updated} items.")
+    print(images.stats())
+    print(photo_index.stats())
+
+
+if __name__ == "__main__":
+    images.start_pool()
+    backfill(restart="--restart" in sys.argv)
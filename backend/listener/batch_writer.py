@@ -0,0 +1,160 @@
+"""
+Batched, idempotent writes for the listener.
+
+Rows are buffered and written as one multi-row upsert once ``max_rows`` are
+waiting or the oldest has waited ``max_delay`` seconds, instead of one
+request per row. Upserts are keyed on a natural key with duplicates ignored,
+so re-running over rows that are already stored changes nothing.
+
+After each write ``on_written(rows, inserted)`` is called with the rows of
+the batch and the stored form of those that weren't already there.
+
+A batch that Postgres rejects is split in half and retried, down to single
+rows. The good rows still go in, and each bad row is reported with its own
+error instead of failing everything around it.
+
+Failures are sorted by whether retrying could help. A row PostgREST rejects
+as a bad request (a constraint violation, a value it can't parse) is
+permanent: it goes to ``rejected``, and is appended to ``rejected_path``
+when one is given so it can be looked at later. Anything else (a dropped
+connection, a 5xx) is transient and goes to ``errors`` for the caller to
+retry.
+"""
+import json
+import os
+import threading
+import time
+import warnings
+from typing import Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+from limits import limit
+
+load_dotenv()
+
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "50"))
+BATCH_MAX_DELAY_SECONDS = float(os.getenv("BATCH_MAX_DELAY_SECONDS", "5"))
+
+# SQLSTATE classes of errors caused by the data itself: data exceptions,
+# integrity constraint violations, and syntax errors or unknown columns.
+PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+
+
+def is_permanent(error: Exception) -> bool:
+    """Whether writing the same rows again can never succeed."""
+    # postgrest's APIError carries the SQLSTATE, or a PGRST code for errors
+    # PostgREST raises itself; PGRST1xx and PGRST2xx are bad requests.
+    code = getattr(error, "code", None)
+    if not isinstance(code, str):
+        return False
+    return code[:2] in PERMANENT_SQLSTATE_CLASSES or code.startswith(("PGRST1", "PGRST2"))
+
+
+class BatchWriter:
+    def __init__(self, client, table: str, on_conflict: str,
+                 max_rows: int = BATCH_MAX_ROWS, max_delay: float = BATCH_MAX_DELAY_SECONDS,
+                 on_written: Optional[Callable[[list, list], None]] = None,
+                 rejected_path: Optional[str] = None):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.on_written = on_written
+        self.rejected_path = rejected_path
+        self.lock = threading.Lock()
+        self.rows = []
+        self.oldest = None
+        self.written = 0
+        self.requests = 0
+        self.errors: List[Tuple[dict, str]] = []
+        self.rejected: List[Tuple[dict, str]] = []
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def add(self, row: dict):
+        """Buffer a row; writes the buffer once it's full."""
+        with self.lock:
+            if self._flusher is None:
+                self._stop.clear()
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+            if not self.rows:
+                self.oldest = time.monotonic()
+            self.rows.append(row)
+            batch = self._take() if len(self.rows) >= self.max_rows else None
+        if batch:
+            self._write(batch)
+
+    def flush(self):
+        """Write whatever is buffered now."""
+        with self.lock:
+            batch = self._take()
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        """Flush and stop the background flusher."""
+        with self.lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            self._stop.set()
+            flusher.join()
+        self.flush()
+
+    def _take(self) -> list:
+        batch, self.rows, self.oldest = self.rows, [], None
+        return batch
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.max_delay / 2):
+            with self.lock:
+                due = self.oldest is not None and time.monotonic() - self.oldest >= self.max_delay
+                batch = self._take() if due else None
+            if batch:
+                self._write(batch)
+
+    def _upsert(self, rows: list) -> list:
+        """Write rows; return the ones that were new, as stored."""
+        with limit("supabase"):
+            return self.client.table(self.table).upsert(
+                rows, on_conflict=self.on_conflict, ignore_duplicates=True).execute().data
+
+    def _reject(self, row: dict, error: Exception):
+        with self.lock:
+            self.rejected.append((row, str(error)))
+            if self.rejected_path is not None:
+                os.makedirs(os.path.dirname(self.rejected_path) or ".", exist_ok=True)
+                with open(self.rejected_path, "a") as f:
+                    f.write(json.dumps({"row": row, "error": str(error)}, default=str) + "\n")
+        warnings.warn(f"{self.table} rejected a row: {error}")
+
+    def _write(self, rows: list):
+        try:
+            inserted = self._upsert(rows)
+        except Exception as e:
+            with self.lock:
+                self.requests += 1
+            if not is_permanent(e):
+                # Splitting the batch won't help; the caller retries it all later.
+                with self.lock:
+                    self.errors.extend((row, str(e)) for row in rows)
+                warnings.warn(f"Failed to write {len(rows)} rows to {self.table}: {e}")
+                return
+            if len(rows) == 1:
+                self._reject(rows[0], e)
+                return
+            # Find the bad rows without losing the good ones.
+            middle = len(rows) // 2
+            self._write(rows[:middle])
+            self._write(rows[middle:])
+            return
+
+        with self.lock:
+            self.requests += 1
+            self.written += len(rows)
+        if self.on_written is not None:
+            self.on_written(rows, inserted)
+
+    def stats(self) -> str:
+        return (f"{self.table} writer: {self.written} rows in {self.requests} requests, "
+                f"{len(self.errors)} failed, {len(self.rejected)} rejected")
@@ -0,0 +1,82 @@
+"""
+Per-mailing-list ingestion watermark.
+
+For each list this remembers which monthly archive was read last, how many
+bytes of it have been processed, and the ETag it had then. The next run
+requests only the tail of that archive, conditionally, so a poll with nothing
+new costs a single small request.
+
+Offsets count bytes of the uncompressed archive, so they mean the same thing
+for ``YYYY-Month.txt`` and ``YYYY-Month.txt.gz``.
+"""
+import json
+import os
+import threading
+from datetime import date
+from typing import List, Optional, Tuple
+from disk_cache import CACHE_DIR
+
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "checkpoints.json")
+
+# Spelled out rather than strftime("%B") so the locale can't change archive names.
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+_lock = threading.Lock()
+
+
+def _read_all() -> dict:
+    if not os.path.exists(CHECKPOINT_PATH):
+        return {}
+    with open(CHECKPOINT_PATH) as f:
+        return json.load(f)
+
+
+def load(mailing_list: str) -> dict:
+    with _lock:
+        return _read_all().get(mailing_list, {})
+
+
+def save(mailing_list: str, month: Tuple[int, int], offset: int, etag: Optional[str]):
+    with _lock:
+        checkpoints = _read_all()
+        checkpoints[mailing_list] = {
+            "month": f"{month[0]:04d}-{month[1]:02d}",
+            "offset": offset,
+            "etag": etag,
+        }
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write then rename so a crash never leaves a half-written file.
+        temp_path = CHECKPOINT_PATH + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(checkpoints, f, indent=2)
+        os.replace(temp_path, CHECKPOINT_PATH)
+
+
+def archive_name(month: Tuple[int, int]) -> str:
+    year, month_number = month
+    return f"{year}-{MONTH_NAMES[month_number - 1]}.txt"
+
+
+def months_to_poll(state: dict, today: Optional[date] = None) -> List[Tuple[int, int]]:
+    """
+    Months whose archives may hold unprocessed messages, oldest first.
+
+    That is the checkpointed month (to finish its tail) through the current
+    month, or just the current month for a list that has never been read.
+    """
+    today = today or date.today()
+    current = (today.year, today.month)
+    if not state.get("month"):
+        return [current]
+
+    year, month_number = (int(part) for part in state["month"].split("-"))
+    months = []
+    while (year, month_number) <= current:
+        months.append((year, month_number))
+        month_number += 1
+        if month_number > 12:
+            year, month_number = year + 1, 1
+    return months
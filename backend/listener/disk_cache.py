@@ -0,0 +1,76 @@
+"""
+Small persistent key/value cache on top of SQLite.
+
+Used by the listener to remember results of slow external calls between
+runs. Entries expire after ``ttl_seconds``. Once the cache holds more than
+``max_entries``, the least recently used entries are evicted. Safe to share
+between the pipeline's worker threads.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DIR = os.getenv(
+    "LISTENER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+
+class DiskCache:
+    def __init__(self, name: str, ttl_seconds: float = None, max_entries: int = None):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(
+            "create table if not exists entries ("
+            "key text primary key, value text not null, "
+            "created_at real not null, accessed_at real not null)")
+        self.db.execute(
+            "create index if not exists entries_accessed_at on entries (accessed_at)")
+        self.db.commit()
+
+    def get(self, key: str):
+        """Return the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "select value, created_at from entries where key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and row[1] + self.ttl_seconds < now:
+                self.db.execute("delete from entries where key = ?", (key,))
+                self.db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute(
+                "update entries set accessed_at = ? where key = ?", (now, key))
+            self.db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "insert or replace into entries (key, value, created_at, accessed_at) values (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now))
+            if self.max_entries is not None:
+                self.db.execute(
+                    "delete from entries where key in ("
+                    "select key from entries order by accessed_at desc limit -1 offset ?)",
+                    (self.max_entries,))
+            self.db.commit()
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return f"{self.name} cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate)"
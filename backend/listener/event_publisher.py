@@ -0,0 +1,42 @@
+"""
+Tell the API about items the listener inserted.
+
+The API fans item-created events out to ``/events`` subscribers, but the
+listener writes straight to the database, so each written batch is posted
+to the API's internal publish endpoint in one request. Publishing is best
+effort: a failure is logged and never holds up ingestion. It is off unless
+EVENTS_API_URL and EVENTS_PUBLISH_TOKEN are set.
+"""
+import os
+import warnings
+from typing import List
+import requests
+from dotenv import load_dotenv
+from mailman_sessions import retry_policy
+
+load_dotenv()
+
+# Base URL of the API app, e.g. https://reuse.example.com/api
+EVENTS_API_URL = os.getenv("EVENTS_API_URL")
+EVENTS_PUBLISH_TOKEN = os.getenv("EVENTS_PUBLISH_TOKEN")
+EVENTS_TIMEOUT_SECONDS = float(os.getenv("EVENTS_TIMEOUT_SECONDS", "5"))
+
+_session = requests.Session()
+
+
+def publish_items_created(items: List[dict]):
+    if not (EVENTS_API_URL and EVENTS_PUBLISH_TOKEN) or not items:
+        return
+    events = [
+        {"type": "item-created", "data": item, "item_id": item.get("id")}
+        for item in items
+    ]
+    try:
+        response = retry_policy.call(lambda: _session.post(
+            EVENTS_API_URL.rstrip("/") + "/internal/publish-events",
+            json={"events": events},
+            headers={"X-Events-Token": EVENTS_PUBLISH_TOKEN},
+            timeout=EVENTS_TIMEOUT_SECONDS))
+        response.raise_for_status()
+    except Exception as e:
+        warnings.warn(f"Failed to publish {len(events)} item-created events: {e}")
@@ -0,0 +1,159 @@
+"""
+Offline gazetteer of MIT campus places.
+
+Almost every pickup location on the lists is one of a few hundred campus
+buildings, so these are resolved locally before any geocoding request.
+Coordinates are approximate building centroids: close enough to put a pin
+on the right building, not survey-grade.
+"""
+import re
+from typing import Optional, Tuple
+
+# Building number -> (lat, lng)
+BUILDINGS = {
+    "1": (42.3580, -71.0923),
+    "2": (42.3589, -71.0897),
+    "3": (42.3585, -71.0917),
+    "4": (42.3593, -71.0908),
+    "5": (42.3581, -71.0931),
+    "6": (42.3597, -71.0903),
+    "7": (42.3592, -71.0935),
+    "8": (42.3600, -71.0914),
+    "9": (42.3604, -71.0937),
+    "10": (42.3594, -71.0920),
+    "11": (42.3588, -71.0923),
+    "12": (42.3602, -71.0912),
+    "13": (42.3605, -71.0918),
+    "14": (42.3594, -71.0896),
+    "16": (42.3604, -71.0902),
+    "17": (42.3610, -71.0925),
+    "18": (42.3612, -71.0898),
+    "24": (42.3610, -71.0930),
+    "26": (42.3612, -71.0915),
+    "32": (42.3617, -71.0906),
+    "33": (42.3600, -71.0938),
+    "34": (42.3613, -71.0924),
+    "36": (42.3616, -71.0928),
+    "38": (42.3610, -71.0926),
+    "39": (42.3619, -71.0922),
+    "46": (42.3622, -71.0914),
+    "50": (42.3590, -71.0885),
+    "54": (42.3603, -71.0893),
+    "56": (42.3609, -71.0903),
+    "62": (42.3602, -71.0860),
+    "64": (42.3605, -71.0857),
+    "66": (42.3613, -71.0893),
+    "68": (42.3620, -71.0910),
+    "76": (42.3624, -71.0912),
+    "e14": (42.3606, -71.0877),
+    "e15": (42.3608, -71.0872),
+    "e17": (42.3616, -71.0865),
+    "e18": (42.3617, -71.0862),
+    "e19": (42.3618, -71.0859),
+    "e25": (42.3614, -71.0866),
+    "e51": (42.3610, -71.0838),
+    "e52": (42.3607, -71.0833),
+    "e62": (42.3617, -71.0840),
+    "w1": (42.3576, -71.0934),
+    "w4": (42.3574, -71.0946),
+    "w7": (42.3567, -71.0958),
+    "w15": (42.3585, -71.0959),
+    "w16": (42.3582, -71.0956),
+    "w20": (42.3591, -71.0948),
+    "w35": (42.3586, -71.0973),
+    "w46": (42.3587, -71.1000),
+    "w51": (42.3561, -71.0989),
+    "w61": (42.3555, -71.0995),
+    "w70": (42.3555, -71.1010),
+    "w71": (42.3545, -71.1027),
+    "w79": (42.3571, -71.1015),
+    "nw35": (42.3596, -71.1009),
+    "nw61": (42.3615, -71.1008),
+    "nw86": (42.3597, -71.1023),
+}
+
+# Names and nicknames -> building number, or a place that has no number.
+PLACES = {
+    "stratton student center": "w20",
+    "student center": "w20",
+    "stud": "w20",
+    "stata": "32",
+    "stata center": "32",
+    "ray and maria stata center": "32",
+    "77 massachusetts ave": "7",
+    "77 massachusetts avenue": "7",
+    "77 mass ave": "7",
+    "lobby 7": "7",
+    "lobby 10": "10",
+    "great dome": "10",
+    "the dome": "10",
+    "infinite corridor": "10",
+    "hayden library": "14",
+    "hayden": "14",
+    "green building": "54",
+    "walker memorial": "50",
+    "walker": "50",
+    "koch institute": "76",
+    "mit.nano": "12",
+    "media lab": "e14",
+    "tang center": "e51",
+    "sloan": "e62",
+    "kresge": "w16",
+    "kresge auditorium": "w16",
+    "chapel": "w15",
+    "z center": "w35",
+    "zesiger": "w35",
+    "maseeh": "w1",
+    "maseeh hall": "w1",
+    "mccormick": "w4",
+    "mccormick hall": "w4",
+    "baker": "w7",
+    "baker house": "w7",
+    "new vassar": "w46",
+    "burton conner": "w51",
+    "burton-conner": "w51",
+    "macgregor": "w61",
+    "macgregor house": "w61",
+    "new house": "w70",
+    "next house": "w71",
+    "simmons": "w79",
+    "simmons hall": "w79",
+    "ashdown": "nw35",
+    "random hall": "nw61",
+    "sidney pacific": "nw86",
+    "sidney-pacific": "nw86",
+    "east campus": "62",
+    "killian court": (42.3591, -71.0913),
+    "kendall square": (42.3625, -71.0862),
+    "kendall": (42.3625, -71.0862),
+}
+
+_building_pattern = re.compile(r"\b(?:building|bldg\.?)\s*#?\s*([nsew]{0,2}\d{1,3})\b")
+_code_pattern = re.compile(r"^([nsew]{0,2}\d{1,3})$")
+# Longest names first so "stata center" wins over "stata".
+_place_pattern = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(PLACES, key=len, reverse=True)) + r")\b")
+
+
+def normalize(address: str) -> str:
+    address = address.lower().replace("’", "'")
+    address = re.sub(r"\bnear mit\b|\bmit\b(?!\.nano)", " ", address)
+    return " ".join(address.split()).strip(" ,.")
+
+
+def lookup(address: str) -> Optional[Tuple[float, float]]:
+    """Resolve a campus address locally, or return None if it isn't a known place."""
+    if not address:
+        return None
+    address = normalize(address)
+
+    match = _building_pattern.search(address) or _code_pattern.match(address)
+    if match and match.group(1) in BUILDINGS:
+        return BUILDINGS[match.group(1)]
+
+    match = _place_pattern.search(address)
+    if match:
+        place = PLACES[match.group(1)]
+        return BUILDINGS[place] if isinstance(place, str) else place
+
+    return None
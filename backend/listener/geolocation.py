@@ -1,26 +1,37 @@
-from openai import OpenAI
 import requests
 from typing import Tuple
 import os
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
+import gazetteer
+from disk_cache import DiskCache
+from limits import limit
+from llm import complete
+import location_rules
+from pipeline import PermanentError
 load_dotenv()
-openai_api_key = os.getenv('OPENAI_API_KEY')
-# Create OpenAI client
-client = OpenAI(api_key=openai_api_key)
+
+# Statuses that asking again won't change, unlike OVER_QUERY_LIMIT or UNKNOWN_ERROR.
+PERMANENT_GEOCODE_STATUSES = ("ZERO_RESULTS", "INVALID_REQUEST")
+
+
+class AddressNotFound(PermanentError):
+    pass
 
 
 def answer_question(question: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": question}]
-    )
-    return response.choices[0].message.content
+    return complete([{"role": "user", "content": question}])
 
 
 def get_address_from_desc(desc: str) -> str:
     if desc == "Location not found":
         return None
 
+    address = location_rules.address_from_location(desc)
+    if address is not None:
+        return address
+
     address = answer_question(
         f"Here is a description of a place near MIT: {desc}. If it mentions building number: what is the full name of building number? Include the word \"building\" in the name. If it mentions building or field name: what is the name? If it refers to a specific address, what is the address? If it refers to a general area in Cambridge, what is in that area? Context: \"stud\" refers to Stratton Student Center. Give me only the building number or name. Do not include the room number or any additional text. If you can't tell, return \"Location not found\".")
     if "building" in address.lower():
@@ -31,10 +42,17 @@ def get_address_from_desc(desc: str) -> str:
     return address
 
 
-def get_gis_from_address(address: str) -> Tuple[float, float]:
-    if address in ["Location not found", None]:
-        return None
+GEOCODE_CACHE_TTL_SECONDS = float(
+    os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 365)))
+
+geocode_cache = DiskCache("geocode", GEOCODE_CACHE_TTL_SECONDS)
+
+# Pipeline workers that ask for the same address at the same time share one request.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
 
+def _geocode(address: str) -> Tuple[float, float]:
     google_api_key = os.getenv('GOOGLE_API_KEY')
     base_url = "https://maps.googleapis.com/maps/api/geocode/json"
 
@@ -43,12 +61,51 @@ def get_gis_from_address(address: str) -> Tuple[float, float]:
         'key': google_api_key
     }
 
-    response = requests.get(base_url, params=params)
+    with limit("geocode"):
+        response = requests.get(base_url, params=params)
     data = response.json()
 
     if data['status'] == 'OK':
         location = data['results'][0]['geometry']['location']
         return location['lat'], location['lng']
+    elif data['status'] in PERMANENT_GEOCODE_STATUSES:
+        raise AddressNotFound(
+            f"Geocoding failed: {data['status']}, searched for {address}")
     else:
         raise Exception(
             f"Geocoding failed: {data['status']}, searched for {address}")
+
+
+def get_gis_from_address(address: str) -> Tuple[float, float]:
+    if address in ["Location not found", None]:
+        return None
+
+    # Known campus places never leave the process.
+    coordinates = gazetteer.lookup(address)
+    if coordinates is not None:
+        return coordinates
+
+    key = gazetteer.normalize(address)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    with _in_flight_lock:
+        pending = _in_flight.get(key)
+        if pending is None:
+            _in_flight[key] = Future()
+    if pending is not None:
+        return pending.result()
+
+    future = _in_flight[key]
+    try:
+        coordinates = _geocode(address)
+        geocode_cache.set(key, coordinates)
+        future.set_result(coordinates)
+        return coordinates
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
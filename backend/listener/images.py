@@ -0,0 +1,151 @@
+"""
+Attachment transcoding for item photos.
+
+Images are decoded, downscaled and re-encoded entirely in memory in a
+process pool, so the pipeline's worker threads aren't serialized on the GIL
+while PIL works. JPEG sources use ``Image.draft`` to let the decoder scale
+down by a power of two while decoding, which skips most of the work for
+large camera photos. Each image is encoded as a set of named variants
+(small, medium and large by default), as JPEG or, where this Pillow build
+supports it, WebP or AVIF. A difference hash of the
+picture comes back alongside, for near-duplicate detection.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+from dotenv import load_dotenv
+from PIL import Image, features
+
+load_dotenv()
+
+# Variant name and longest edge, largest first. The largest is the one
+# photo_urls link to; the rest are listed in items.photo_variants.
+IMAGE_VARIANTS = sorted(
+    ((name, int(size)) for name, size in (
+        variant.split(":") for variant in os.getenv("IMAGE_VARIANTS", "large:720,medium:480,small:240").split(","))),
+    key=lambda variant: variant[1], reverse=True)
+MAIN_VARIANT = IMAGE_VARIANTS[0][0]
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_PROCESSES = int(os.getenv("IMAGE_PROCESSES", str(os.cpu_count() or 1)))
+
+FORMATS = {
+    # format: (PIL format name, file extension, content type)
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "avif": ("AVIF", "avif", "image/avif"),
+}
+
+if IMAGE_FORMAT not in FORMATS or (IMAGE_FORMAT != "jpeg" and not features.check(IMAGE_FORMAT)):
+    print(f"Image format {IMAGE_FORMAT} isn't available, using jpeg.")
+    IMAGE_FORMAT = "jpeg"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+image_stats = {"images": 0, "source_bytes": 0, "encoded_bytes": 0, "started": None, "finished": None}
+
+
+def extension(image_format: str = IMAGE_FORMAT) -> str:
+    return FORMATS[image_format][1]
+
+
+def content_type(image_format: str = IMAGE_FORMAT) -> str:
+    return FORMATS[image_format][2]
+
+
+def variant_path(stem: str, name: str, image_format: str = IMAGE_FORMAT) -> str:
+    """Storage path of one variant: <stem>.<ext> for the main one, <stem>_<name>.<ext> otherwise."""
+    if name == MAIN_VARIANT:
+        return f"{stem}.{extension(image_format)}"
+    return f"{stem}_{name}.{extension(image_format)}"
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale is brighter than the next."""
+    pixels = list(img.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def transcode(image_bytes: bytes, variants=IMAGE_VARIANTS, image_format: str = IMAGE_FORMAT,
+              quality: int = IMAGE_QUALITY) -> Tuple[Dict[str, bytes], int]:
+    """Return ({variant name: encoded bytes}, largest first, and the dHash)."""
+    pil_format = FORMATS[image_format][0]
+    encoded = {}
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # Only does anything for JPEG: decode at the smallest scale that is
+        # still at least as large as the biggest requested size.
+        largest = variants[0][1]
+        img.draft("RGB", (largest, largest))
+        img = img.convert("RGB")
+        image_hash = dhash(img)
+        for name, size in variants:
+            # Each size is made from the previous, smaller-than-source one.
+            img.thumbnail((size, size))
+            buffer = io.BytesIO()
+            img.save(buffer, format=pil_format, quality=quality)
+            encoded[name] = buffer.getvalue()
+    return encoded, image_hash
+
+
+def start_pool():
+    """
+    Fork the transcoding workers now, while this is the only thread.
+
+    Scripts call this before starting any threads. Forked workers share the
+    modules already imported here, where spawned ones would each import the
+    script's main module and everything it pulls in again.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None or "fork" not in multiprocessing.get_all_start_methods():
+            return
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_PROCESSES, mp_context=multiprocessing.get_context("fork"))
+        # With fork, the first submit starts every worker before it returns.
+        _pool.submit(int).result()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Without start_pool, this runs in a pipeline worker while other
+            # threads are running, so the workers are spawned: a forked child
+            # could inherit a lock some other thread was holding and hang on it.
+            _pool = ProcessPoolExecutor(
+                max_workers=IMAGE_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def transcode_in_pool(image_bytes: bytes, variants=IMAGE_VARIANTS) -> Tuple[Dict[str, bytes], int]:
+    """transcode() in the shared process pool, blocking the calling thread until done."""
+    start = time.perf_counter()
+    encoded, image_hash = _get_pool().submit(transcode, image_bytes, variants).result()
+    with _stats_lock:
+        image_stats["images"] += 1
+        image_stats["source_bytes"] += len(image_bytes)
+        image_stats["encoded_bytes"] += sum(len(data) for data in encoded.values())
+        if image_stats["started"] is None:
+            image_stats["started"] = start
+        image_stats["finished"] = time.perf_counter()
+    return encoded, image_hash
+
+
+def stats() -> str:
+    images = image_stats["images"]
+    elapsed = images and image_stats["finished"] - image_stats["started"]
+    rate = images / elapsed if elapsed else 0.0
+    saved = image_stats["source_bytes"] - image_stats["encoded_bytes"]
+    return (f"images: transcoded {images} to {IMAGE_FORMAT} ({rate:.1f}/s), "
+            f"{saved} bytes saved of {image_stats['source_bytes']}")
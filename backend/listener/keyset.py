@@ -0,0 +1,25 @@
+"""
+Keyset filters for tables paged by (created_at, id).
+
+Lives with the listener because it is imported flat by the listener's
+scripts and as ``backend.listener.keyset`` by the API; it has no
+dependencies so both can load it.
+"""
+
+
+def after_key(query, created_at: str, row_id: str, desc: bool = True):
+    """
+    Restrict a query ordered by (created_at, id) to rows after (created_at, id).
+
+    PostgREST has no row comparison, so the keyset condition is an or().
+    Postgres can't turn that into an index bound by itself, so the redundant
+    lte/gte on created_at is what lets it start the (created_at, id) index
+    scan at the key instead of walking from the first row.
+    """
+    op = "lt" if desc else "gt"
+    bound = query.lte if desc else query.gte
+    # Values are quoted because timestamps contain PostgREST's reserved characters.
+    return bound("created_at", created_at).or_(
+        f'created_at.{op}."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.{op}."{row_id}")'
+    )
@@ -0,0 +1,28 @@
+"""
+Per-service concurrency limits for the listener.
+
+Every call to an external service is wrapped in ``with limit(service):``.
+However many pipeline workers are running, each service then sees at most
+its configured number of requests in flight.
+"""
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVICE_LIMITS = {
+    "openai": int(os.getenv("OPENAI_CONCURRENCY", "4")),
+    "geocode": int(os.getenv("GEOCODE_CONCURRENCY", "4")),
+    "mailman": int(os.getenv("MAILMAN_CONCURRENCY", "4")),
+    "supabase": int(os.getenv("SUPABASE_CONCURRENCY", "4")),
+}
+
+_semaphores = {
+    service: threading.BoundedSemaphore(size)
+    for service, size in SERVICE_LIMITS.items()
+}
+
+
+def limit(service: str) -> threading.BoundedSemaphore:
+    return _semaphores[service]
@@ -5,27 +5,133 @@ from utils import *
 
 # Now I can import
 from geolocation import *
+from pipeline import Stage, run_pipeline
+from disk_cache import CACHE_DIR
+from llm import llm_cache
+from mailman_sessions import mailman_sessions
+import location_rules
+import images
+from photo_index import photo_index
+import checkpoint
 
-urls = [
-    (
-        'https://mailman.mit.edu/mailman/private/reuse/',
-        'https://mailman.mit.edu/mailman/private/reuse/2024-September.txt.gz'
-    ),
-    (
-        'https://mailman.mit.edu/mailman/private/free-foods/',
-        'https://mailman.mit.edu/mailman/private/free-foods/2024-September.txt.gz'
-    )
+# Archive index of each list. Monthly archives live underneath, e.g.
+# .../reuse/2024-September.txt, and the same URL is the login form.
+mailing_list_urls = [
+    'https://mailman.mit.edu/mailman/private/reuse/',
+    'https://mailman.mit.edu/mailman/private/free-foods/',
 ]
 
 
+# Worker threads per pipeline stage. Calls to each external service are
+# additionally capped by the limits in limits.py.
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "4"))
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "8"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+INSERT_WORKERS = int(os.getenv("INSERT_WORKERS", "2"))
+
+# Messages a stage failed on for good, such as an address Google can't find.
+REJECTED_MESSAGES_PATH = os.path.join(CACHE_DIR, "rejected_messages.jsonl")
+
+
+def ingest(stream, mailing_list, start_offset=0) -> int:
+    """
+    Process the stream's messages; return how many a stage dropped on a
+    transient failure, which a later run can retry.
+
+    Messages a stage rejected for good are appended to REJECTED_MESSAGES_PATH
+    and not counted, so they don't hold the checkpoint back. Raises if the
+    download fails partway.
+    """
+    # Messages flow through every stage as the archive downloads. The dedup
+    # stage reads only the headers and drops later copies of a subject, so
+    # duplicates are gone before any parsing, model calls or uploads without
+    # holding the archive in memory. It runs on one thread ahead of the
+    # parse workers so it always sees the archive's order.
+    stages = [
+        Stage("dedup", duplicate_message_filter()),
+        Stage("parse", lambda message: parse_email(
+            message[1], mailing_list), PARSE_WORKERS),
+        Stage("enrich", enrich_email, ENRICH_WORKERS),
+        Stage("images", upload_images, IMAGE_WORKERS),
+        Stage("insert", insert_email, INSERT_WORKERS),
+    ]
+    for stage in stages:
+        stage.rejected_path = REJECTED_MESSAGES_PATH
+    try:
+        run_pipeline(stream.messages(start_offset), stages)
+    finally:
+        item_writer.close()
+    rejected = sum(stage.rejected for stage in stages)
+    if rejected:
+        print(f"{rejected} messages can never be processed, see {REJECTED_MESSAGES_PATH}.")
+    return sum(stage.errors for stage in stages)
+
+
+def update_list(login_url):
+    """
+    Process whatever has been posted to a list since its last checkpoint.
+
+    Stops at the first month that can't be read completely, leaving the
+    checkpoint there so the next run retries it.
+    """
+    list_name = login_url.rstrip('/').rsplit('/', 1)[-1]
+    state = checkpoint.load(list_name)
+
+    for month in checkpoint.months_to_poll(state):
+        resuming = state.get("month") == f"{month[0]:04d}-{month[1]:02d}"
+        start_offset = state.get("offset", 0) if resuming else 0
+        etag = state.get("etag") if resuming else None
+
+        url = login_url + checkpoint.archive_name(month)
+        try:
+            result = get_logs(login_url, url, start_offset, etag)
+            if result is None:
+                # Older months may only be kept gzipped.
+                result = get_logs(login_url, url + '.gz', start_offset)
+        except Exception as e:
+            print(f"Failed to download {url}: {e}. Retrying from here next run.")
+            return
+        if result is None:
+            print(f"No archive at {url}, skipping.")
+            continue
+
+        stream, mailing_list = result
+        failed_before = len(item_writer.errors)
+        try:
+            dropped = ingest(stream, mailing_list, start_offset)
+        except Exception as e:
+            print(f"Download of {url} broke off: {e}. Not advancing the checkpoint.")
+            return
+        if not stream.complete:
+            # The last message read may have been cut off; its start lies
+            # before end_offset, so saving that would skip it for good.
+            print(f"Download of {url} ended early, not advancing the checkpoint.")
+            return
+        if dropped:
+            print(f"{dropped} messages from {url} failed to process, not advancing the checkpoint.")
+            return
+        if len(item_writer.errors) > failed_before:
+            # Leave the checkpoint where it was so the next run retries these
+            # rows; the ones already written are skipped by the upsert. Rows
+            # the database rejected outright aren't counted here: retrying
+            # can't help them, so they don't hold the checkpoint back.
+            print(f"Some items from {url} could not be written, not advancing the checkpoint.")
+            return
+        print(f"Processed {url} up to byte {stream.end_offset}.")
+        checkpoint.save(list_name, month, stream.end_offset, stream.etag)
+
+
 def update_db():
-    for url_pair in urls:
-        login_url, url = url_pair
-        log_text, mailing_list = get_logs(login_url, url)
-        emails = parse_logs(log_text, mailing_list)
+    images.start_pool()
+    for login_url in mailing_list_urls:
+        update_list(login_url)
 
-        for email in emails:
-            write_to_db(email)
+    print(llm_cache.stats())
+    print(location_rules.stats())
+    print(mailman_sessions.stats())
+    print(images.stats())
+    print(photo_index.stats())
+    print(item_writer.stats())
 
 
 if __name__ == "__main__":
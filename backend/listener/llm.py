@@ -0,0 +1,43 @@
+"""
+Memoized chat completions for the listener.
+
+Every model call goes through ``complete``. It keys the result on a hash of
+the model and messages and stores it on disk, so re-running the listener on
+an archive it has already seen makes no model calls.
+"""
+import hashlib
+import json
+import os
+from dotenv import load_dotenv
+from openai import OpenAI
+from disk_cache import DiskCache
+from limits import limit
+
+load_dotenv()
+
+openai_api_key = os.getenv('OPENAI_API_KEY')
+# Create OpenAI client
+client = OpenAI(api_key=openai_api_key)
+
+LLM_CACHE_TTL_SECONDS = float(
+    os.getenv("LLM_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 90)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+
+llm_cache = DiskCache("llm", LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
+
+
+def complete(messages, model="gpt-4o") -> str:
+    key = hashlib.sha256(json.dumps(
+        {"model": model, "messages": messages}, sort_keys=True).encode()).hexdigest()
+    content = llm_cache.get(key)
+    if content is not None:
+        return content
+
+    with limit("openai"):
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages
+        )
+    content = response.choices[0].message.content
+    llm_cache.set(key, content)
+    return content
@@ -0,0 +1,133 @@
+"""
+Rule-based extraction of pickup locations and self-pickup from email text.
+
+Most emails spell out their location plainly ("Building 32, room 123",
+"E14-240", "outside the Stud"). These rules resolve those cases locally and
+report a confidence, so the model is only asked when the rules are unsure.
+"""
+import re
+import threading
+from typing import Optional, Tuple
+from gazetteer import BUILDINGS, PLACES
+
+# Below this confidence the caller should fall back to the model.
+RULES_MIN_CONFIDENCE = 0.75
+
+# Display names for numbered buildings better known by name.
+BUILDING_NAMES = {
+    "w20": "Stratton Student Center",
+    "32": "Stata Center",
+    "14": "Hayden Library",
+    "e14": "Media Lab",
+    "w16": "Kresge Auditorium",
+    "w35": "Zesiger Center",
+    "e51": "Tang Center",
+}
+
+_building_room_pattern = re.compile(
+    r"\b(?:building|bldg\.?)\s*#?\s*([nsew]{0,2}\d{1,3})\b(?:\s*,?\s*(?:room|rm\.?)\s*#?\s*(\d{1,4}[a-z]?)\b)?",
+    re.IGNORECASE)
+# MIT room numbers: "32-123", "E14-240", "W20-491", "32-G882". The lookarounds keep
+# phone numbers like 617-253-1000 and prices like $10-200 from matching.
+_room_number_pattern = re.compile(
+    r"(?<![\d$€£#.,-])\b([nsew]{0,2}\d{1,3})-([a-z]?\d{3,4}[a-z]?)\b(?!-\d)", re.IGNORECASE)
+# A bare "10-200" is as often a quantity or price range as a room, so one
+# with no letters in it only counts right after "room", "in the" and such.
+# Named places need the same cue.
+_room_cue_pattern = re.compile(
+    r"\b(?:room|rm|office|lab|in|at|outside|near|by|to|from|located|pick\s?up)"
+    r"(?:\s+(?:room|rm|office|lab|the|my|our))?\W*$",
+    re.IGNORECASE)
+_place_pattern = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(PLACES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE)
+
+_self_pickup_pattern = re.compile(
+    r"\b(self[- ]?pick[- ]?up|come (?:and )?(?:grab|take|get)|first come|help yourself|"
+    r"free for the taking|take (?:what|whatever) you|left (?:outside|in|on|at)|outside my door|"
+    r"up for grabs|grab (?:it|them|some)|feel free to (?:take|grab))\b",
+    re.IGNORECASE)
+_arranged_pickup_pattern = re.compile(
+    r"\b(reply to|email me|e-mail me|contact me|dm me|text me|message me|let me know|"
+    r"reach out|coordinate|arrange|schedule a pick)",
+    re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+rule_stats = {"resolved": 0, "fallback": 0}
+
+
+def _building_label(code: str, room: Optional[str] = None) -> str:
+    label = f"Building {code.upper()}"
+    return f"{label}, room {room}" if room else label
+
+
+def extract_location(text: str, needs_cue: bool = True) -> Tuple[Optional[str], float]:
+    """
+    Return (location, confidence). Several different places lower the confidence.
+
+    With needs_cue False, text is taken to be a location already, so a bare
+    place name counts without a cue before it.
+    """
+    found = {}
+    for pattern in (_building_room_pattern, _room_number_pattern):
+        for match in pattern.finditer(text):
+            code = match.group(1).lower()
+            if code not in BUILDINGS or code in found:
+                continue
+            if (pattern is _room_number_pattern and (code + match.group(2)).isdigit()
+                    and not _room_cue_pattern.search(text[max(0, match.start() - 40):match.start()])):
+                continue
+            found[code] = _building_label(code, match.group(2))
+
+    # Nicknames double as ordinary words ("baby walker", "stud finder"), so a
+    # named place is only trusted when a cue like "in the" comes right before it.
+    named, cued = {}, set()
+    for match in _place_pattern.finditer(text):
+        place = PLACES[match.group(1).lower()]
+        key = place if isinstance(place, str) else match.group(1).lower()
+        named.setdefault(key, match.group(1))
+        if not needs_cue or _room_cue_pattern.search(text[max(0, match.start() - 40):match.start()]):
+            cued.add(key)
+
+    if len(found) == 1 and set(named) <= set(found):
+        return next(iter(found.values())), 0.9
+    if not found and len(named) == 1:
+        key, phrase = next(iter(named.items()))
+        label = BUILDING_NAMES.get(key, phrase.title())
+        return label, 0.8 if key in cued else 0.4
+    if found or named:
+        first = next(iter(found.values())) if found else next(iter(named.values())).title()
+        return first, 0.4
+    return None, 0.0
+
+
+def extract_can_self_pickup(text: str) -> Tuple[Optional[bool], float]:
+    self_pickup = _self_pickup_pattern.search(text) is not None
+    arranged = _arranged_pickup_pattern.search(text) is not None
+    if self_pickup and not arranged:
+        return True, 0.85
+    if arranged and not self_pickup:
+        return False, 0.8
+    return None, 0.0
+
+
+def address_from_location(location: str) -> Optional[str]:
+    """Geocodable address for a location the rules can place confidently, else None."""
+    found, confidence = extract_location(location, needs_cue=False)
+    if found is None or confidence < RULES_MIN_CONFIDENCE:
+        return None
+    name = found.split(",")[0]
+    if name.startswith("Building "):
+        return "MIT building " + name[len("Building "):]
+    return name + " near MIT"
+
+
+def record(resolved: bool):
+    with _stats_lock:
+        rule_stats["resolved" if resolved else "fallback"] += 1
+
+
+def stats() -> str:
+    total = rule_stats["resolved"] + rule_stats["fallback"]
+    return (f"location rules: resolved {rule_stats['resolved']} of {total} lookups locally, "
+            f"{rule_stats['fallback']} fell back to the model")
@@ -0,0 +1,149 @@
+"""
+Shared, authenticated HTTP sessions for the private mailman archives.
+
+Private archives sit behind a login form that sets a session cookie. Each
+list is logged in to once and its session is reused for every archive and
+attachment download, so requests share keep-alive connections from a pool
+sized to the mailman concurrency limit. When a session expires, mailman
+answers with the login page instead of the file; only then is the list
+logged in to again.
+
+Transient failures (connection errors, 429 and 5xx) are retried by one
+shared ``RetryPolicy`` with exponential backoff and full jitter.
+"""
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from limits import SERVICE_LIMITS, limit
+
+load_dotenv()
+
+username = os.getenv('MIT_USERNAME')
+password = os.getenv('MIT_PASSWORD')
+
+MAILMAN_TIMEOUT_SECONDS = float(os.getenv("MAILMAN_TIMEOUT_SECONDS", "30"))
+
+# Throttling and server-side hiccups; anything else is returned to the caller.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter, so workers that failed together don't retry together.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, request) -> requests.Response:
+        """Call request() until it gives a non-retryable response or attempts run out."""
+        for attempt in range(self.attempts):
+            last_attempt = attempt == self.attempts - 1
+            try:
+                response = request()
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if last_attempt or response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                response.close()
+            print(f'Request failed. Attempt {attempt + 1} of {self.attempts}, retrying...')
+            time.sleep(self.delay(attempt))
+
+
+retry_policy = RetryPolicy(
+    attempts=int(os.getenv("MAILMAN_RETRY_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("MAILMAN_RETRY_BASE_DELAY", "0.5")),
+    max_delay=float(os.getenv("MAILMAN_RETRY_MAX_DELAY", "10")),
+)
+
+
+class _ListSession:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.session = None
+        # Bumped on every login, so workers that all saw the same expired
+        # session trigger one re-login between them.
+        self.generation = 0
+
+
+class MailmanSessions:
+    def __init__(self, pool_size: int, policy: RetryPolicy, timeout: float):
+        self.pool_size = pool_size
+        self.policy = policy
+        self.timeout = timeout
+        self.lists = {}
+        self.lock = threading.Lock()
+        self.logins = 0
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # Retries are left to the policy so they back off and jitter.
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _list_session(self, login_url: str) -> _ListSession:
+        with self.lock:
+            if login_url not in self.lists:
+                self.lists[login_url] = _ListSession()
+            return self.lists[login_url]
+
+    def _logged_in(self, login_url: str, stale_generation: int = None):
+        entry = self._list_session(login_url)
+        with entry.lock:
+            if entry.session is None or entry.generation == stale_generation:
+                if entry.session is None:
+                    entry.session = self._new_session()
+                entry.session.cookies.clear()
+                login_data = {
+                    'username': username,
+                    'password': password,
+                    'submit': 'Let me in...'
+                }
+                self._send(lambda: entry.session.post(
+                    login_url, data=login_data, timeout=self.timeout)).close()
+                entry.generation += 1
+                self.logins += 1
+            return entry.session, entry.generation
+
+    def _send(self, request) -> requests.Response:
+        def limited():
+            with limit("mailman"):
+                return request()
+        return self.policy.call(limited)
+
+    @staticmethod
+    def _is_login_page(response: requests.Response, url: str) -> bool:
+        # Archives and attachments are never HTML, so HTML means the login form.
+        content_type = response.headers.get('Content-Type', '')
+        return (response.status_code == 200 and content_type.startswith('text/html')
+                and not url.endswith(('.html', '/')))
+
+    def get(self, login_url: str, url: str, **kwargs) -> requests.Response:
+        """GET url from the list at login_url, logging in first if needed."""
+        kwargs.setdefault('timeout', self.timeout)
+        session, generation = self._logged_in(login_url)
+        response = self._send(lambda: session.get(url, **kwargs))
+        if self._is_login_page(response, url):
+            response.close()
+            session, _ = self._logged_in(login_url, stale_generation=generation)
+            response = self._send(lambda: session.get(url, **kwargs))
+        return response
+
+    def stats(self) -> str:
+        return f"mailman: {self.logins} logins for {len(self.lists)} lists"
+
+
+mailman_sessions = MailmanSessions(
+    SERVICE_LIMITS["mailman"], retry_policy, MAILMAN_TIMEOUT_SECONDS)
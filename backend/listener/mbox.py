@@ -0,0 +1,107 @@
+"""
+Incremental reader for mailman's monthly text archives.
+
+Bytes are decompressed (when the archive is gzipped) and split into lines as
+they arrive, then grouped into messages. The full archive is never held in
+memory. Every message carries the byte offset where it starts in the
+uncompressed archive, and ``end_offset`` tracks how far the stream has been
+read, so a later run can pick up where this one stopped. ``complete`` is only
+set once the download has been read to its end; after a cut-off download
+``end_offset`` may fall inside a message and must not be saved.
+"""
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class MboxStream:
+    def __init__(self, chunks: Iterable[bytes], base_offset: int = 0, etag: Optional[str] = None):
+        self.chunks = chunks
+        self.end_offset = base_offset
+        self.complete = False
+        # ETag of the archive this stream was read from, for conditional re-requests.
+        self.etag = etag
+
+    def lines(self) -> Iterator[Tuple[int, str]]:
+        """Yield (byte offset, line) for each line, without the trailing newline."""
+        decompressor = None
+        buffer = b""
+        # Bytes held back until there are enough to tell whether the archive is gzipped.
+        head = b""
+        for chunk in self.chunks:
+            if head is not None:
+                head += chunk
+                if len(head) < len(GZIP_MAGIC):
+                    continue
+                chunk, head = head, None
+                if chunk.startswith(GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            buffer += chunk
+            buffer = yield from self._split(buffer)
+
+        if head:
+            # Too short to be gzip, so it's the whole (plain) archive.
+            buffer += head
+        if decompressor is not None:
+            buffer += decompressor.flush()
+            buffer = yield from self._split(buffer)
+        if buffer:
+            offset = self.end_offset
+            self.end_offset += len(buffer)
+            yield offset, buffer.decode("utf-8", errors="replace")
+        # A gzip stream that stops early leaves the decompressor short of its end.
+        self.complete = decompressor is None or decompressor.eof
+
+    def _split(self, buffer: bytes):
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line = buffer[start:end].rstrip(b"\r").decode("utf-8", errors="replace")
+            yield self.end_offset, line
+            self.end_offset += end + 1 - start
+            start = end + 1
+        return buffer[start:]
+
+    def messages(self, start_offset: int = 0) -> Iterator[Tuple[int, str]]:
+        """Yield (byte offset, email text), skipping messages before start_offset."""
+        for offset, email_text in iter_messages(self.lines()):
+            if offset >= start_offset:
+                yield offset, email_text
+
+
+def iter_messages(lines: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+    """Group (offset, line) pairs into (offset, email text), skipping digests."""
+    current_email = []
+    current_offset = None
+    inside_digest = False
+
+    for offset, line in lines:
+        if inside_digest:
+            if line.startswith("End of Reuse Digest"):
+                inside_digest = False
+            continue
+        words = line.split()
+        if len(words) >= 3 and words[0] == "From:":
+            if words[1] == "Reuse":
+                inside_digest = True
+                continue
+
+            if current_email:
+                yield current_offset, '\n'.join(current_email)
+                current_email = []
+            current_offset = offset
+            current_email.append(line)
+        elif len(words) >= 3 and words[0] == "From" and words[2] == "at":
+            pass
+        else:
+            if not current_email:
+                current_offset = offset
+            current_email.append(line)
+
+    if current_email:
+        yield current_offset, '\n'.join(current_email)
@@ -0,0 +1,103 @@
+"""
+Local index of photos already uploaded to the ``item_photos`` bucket.
+
+Forwarded and re-posted listings carry the same attachments again. Photos
+are stored under the SHA-256 of their source bytes, and this index maps
+that hash, plus a 64-bit difference hash (dHash) of the picture, to the
+stored object. A byte-identical photo is found by its content hash before
+it is even decoded. A re-encoded or resized copy is caught by a dHash within
+``PHOTO_HASH_MAX_DISTANCE`` bits of one already uploaded. Either way the
+existing object is reused instead of uploading a new one.
+
+Alongside the main object each entry lists the paths of its resized
+variants, so a reused photo brings its thumbnails with it.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from disk_cache import CACHE_DIR
+
+load_dotenv()
+
+# Hamming distance between dHashes that still counts as the same photo.
+# Negative turns near-duplicate matching off.
+PHOTO_HASH_MAX_DISTANCE = int(os.getenv("PHOTO_HASH_MAX_DISTANCE", "4"))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PhotoIndex:
+    def __init__(self, name: str = "photos", max_distance: int = PHOTO_HASH_MAX_DISTANCE):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self.max_distance = max_distance
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(
+            "create table if not exists photos ("
+            "content_hash text primary key, dhash text not null, file_path text not null, "
+            "variants text)")
+        columns = [row[1] for row in self.db.execute("pragma table_info(photos)")]
+        if "variants" not in columns:
+            # Indexes written before variants existed.
+            self.db.execute("alter table photos add column variants text")
+        self.db.commit()
+        # dHashes are scanned linearly; even a few hundred thousand photos
+        # take a few milliseconds, far less than an upload.
+        self.dhashes = [
+            (int(dhash, 16), (file_path, json.loads(variants or "{}")))
+            for dhash, file_path, variants in self.db.execute(
+                "select dhash, file_path, variants from photos")
+        ]
+
+    def find_exact(self, content_hash: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """(file path, {variant name: path}) of an identical photo, or None."""
+        with self.lock:
+            row = self.db.execute(
+                "select file_path, variants from photos where content_hash = ?", (content_hash,)).fetchone()
+            if row is None:
+                return None
+            self.exact_hits += 1
+            return row[0], json.loads(row[1] or "{}")
+
+    def find_similar(self, dhash: int) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Like find_exact, for the closest photo within max_distance."""
+        if self.max_distance < 0:
+            return None
+        with self.lock:
+            best = None
+            for other, photo in self.dhashes:
+                distance = hamming_distance(dhash, other)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, photo)
+            if best is not None:
+                self.similar_hits += 1
+            return best[1] if best else None
+
+    def add(self, content_hash: str, dhash: int, file_path: str, variants: Dict[str, str],
+            uploaded: bool = True):
+        """Record a photo; uploaded=False adds another source for an existing object."""
+        with self.lock:
+            if uploaded:
+                self.misses += 1
+            self.db.execute(
+                "insert or replace into photos (content_hash, dhash, file_path, variants) "
+                "values (?, ?, ?, ?)",
+                (content_hash, f"{dhash:016x}", file_path, json.dumps(variants)))
+            self.db.commit()
+            self.dhashes.append((dhash, (file_path, variants)))
+
+    def stats(self) -> str:
+        return (f"photo index: {self.exact_hits} identical and {self.similar_hits} similar photos "
+                f"reused, {self.misses} uploaded")
+
+
+photo_index = PhotoIndex()
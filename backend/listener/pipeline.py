@@ -0,0 +1,176 @@
+"""
+Staged, concurrent processing for the listener.
+
+Each stage runs on its own pool of worker threads and hands items to the next
+stage through a bounded queue. A slow stage (usually the model calls) fills
+its input queue, which blocks the stage before it. The pipeline therefore
+applies backpressure instead of buffering the whole archive in memory.
+External calls inside the stages are still capped per service by
+``limits.limit``.
+
+An item whose stage function raises is dropped. If the error is a
+``PermanentError`` (the item would fail the same way on every run) it is
+counted in the stage's ``rejected`` and appended to ``rejected_path`` when one
+is given; anything else is transient and counted in ``errors``, for the
+caller to retry. An exception from the input iterable ends the run, and
+``run_pipeline`` raises it once the items already fed in have drained.
+"""
+import json
+import os
+import queue
+import threading
+import warnings
+from typing import Callable, Hashable, Iterable, List, Optional
+
+_DONE = object()
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+
+
+class PermanentError(Exception):
+    """Raised by a stage function for an item that retrying can't help."""
+
+
+class Stage:
+    """A step of the pipeline. ``fn`` returns the item to pass on, or None to drop it."""
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, rejected_path: Optional[str] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.rejected_path = rejected_path
+        # Items dropped because fn raised; read them after run_pipeline returns.
+        self.errors = 0
+        self.rejected = 0
+
+    def _reject(self, item, error: Exception):
+        self.rejected += 1
+        if self.rejected_path is not None:
+            os.makedirs(os.path.dirname(self.rejected_path) or ".", exist_ok=True)
+            with open(self.rejected_path, "a") as f:
+                f.write(json.dumps({"stage": self.name, "item": item, "error": str(error)}, default=str) + "\n")
+
+
+def _run_stage(stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: List[int], lock: threading.Lock, next_workers: int):
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            break
+        try:
+            result = stage.fn(item)
+        except PermanentError as e:
+            with lock:
+                stage._reject(item, e)
+            warnings.warn(f"Stage '{stage.name}' rejected an item: {e}")
+            continue
+        except Exception as e:
+            with lock:
+                stage.errors += 1
+            warnings.warn(f"Stage '{stage.name}' failed, dropping item: {e}")
+            continue
+        if result is not None:
+            outbox.put(result)
+
+    # The last worker out tells every worker of the next stage to finish.
+    with lock:
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            for _ in range(next_workers):
+                outbox.put(_DONE)
+
+
+def keep_best(items: Iterable, key: Callable[..., Hashable], rank: Callable) -> list:
+    """
+    Dedup stage: keep one item per key, the one with the lowest rank.
+
+    Single pass over the items; the survivors keep their first-seen order.
+    """
+    best = {}
+    for item in items:
+        item_key = key(item)
+        item_rank = rank(item)
+        current = best.get(item_key)
+        if current is None or item_rank < current[0]:
+            best[item_key] = (item_rank, item)
+    return [item for _, item in best.values()]
+
+
+def best_so_far(key: Callable[..., Hashable], rank: Callable) -> Callable:
+    """
+    Streaming dedup stage: pass an item on only if it ranks lower than every
+    earlier item with its key.
+
+    Only one rank per key is held, never the items, so nothing waits for the
+    end of the input. When items arrive in rank order this keeps exactly what
+    keep_best would. An item that beats a duplicate already passed on goes
+    through too, since the earlier one can't be called back.
+    """
+    best = {}
+    lock = threading.Lock()
+
+    def stage(item):
+        item_key = key(item)
+        item_rank = rank(item)
+        with lock:
+            current = best.get(item_key)
+            if current is not None and item_rank >= current:
+                return None
+            best[item_key] = item_rank
+        return item
+
+    return stage
+
+
+def run_pipeline(items: Iterable, stages: List[Stage], queue_size: int = PIPELINE_QUEUE_SIZE) -> list:
+    """
+    Push items through the stages concurrently.
+
+    Returns whatever comes out of the last stage, in completion order.
+    Raises whatever the input iterable raised, if it did.
+    """
+    queues = [queue.Queue(queue_size) for _ in stages]
+    # Results are collected on this thread, so the last queue is unbounded.
+    queues.append(queue.Queue())
+
+    threads = []
+    for i, stage in enumerate(stages):
+        next_workers = stages[i + 1].workers if i + 1 < len(stages) else 1
+        remaining = [stage.workers]
+        lock = threading.Lock()
+        for _ in range(stage.workers):
+            thread = threading.Thread(
+                target=_run_stage,
+                args=(stage, queues[i], queues[i + 1], remaining, lock, next_workers),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+    feed_error = []
+
+    def feed():
+        try:
+            for item in items:
+                queues[0].put(item)
+        except BaseException as e:
+            feed_error.append(e)
+        finally:
+            for _ in range(stages[0].workers):
+                queues[0].put(_DONE)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    results = []
+    while True:
+        item = queues[-1].get()
+        if item is _DONE:
+            break
+        results.append(item)
+
+    feeder.join()
+    for thread in threads:
+        thread.join()
+    if feed_error:
+        raise feed_error[0]
+    return results
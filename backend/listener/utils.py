@@ -1,27 +1,31 @@
 import re
-from typing import List, Tuple
-import uuid
-import warnings
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
 import requests
+import warnings
 from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-from datetime import timedelta, datetime
-from PIL import Image
-import io
-import tempfile
+from datetime import timedelta, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from geolocation import *
+from limits import SERVICE_LIMITS, limit
+import images
+from photo_index import photo_index
+from llm import complete
+import location_rules
+from pipeline import best_so_far, keep_best
+from keyset import after_key
+from batch_writer import BatchWriter
+from event_publisher import publish_items_created
+from mbox import MboxStream, iter_messages
+from mailman_sessions import mailman_sessions
+from disk_cache import CACHE_DIR
 
 load_dotenv()
 
-username = os.getenv('MIT_USERNAME')
-password = os.getenv('MIT_PASSWORD')
-
-openai_api_key = os.getenv('OPENAI_API_KEY')
-# Create OpenAI client
-client = OpenAI(api_key=openai_api_key)
-
 supabase_url: str = os.environ.get("SUPABASE_URL")
 supabase_key: str = os.environ.get("SUPABASE_SERVICE_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
@@ -41,14 +45,17 @@ class Email:
         self.name = name
         self.links = []
         self.mailman_links = []
+        self.photo_variants = []  # {variant name: public url} per mailman link
         self.can_self_pickup = can_self_pickup
 
     def __str__(self):
         return f"Subject: {self.subject}\nFrom: {self.from_}\nMailing List: {self.mailing_list}\nName: {self.name}\nDate: {self.date}\nCan self-pickup: {self.can_self_pickup}\nBody: {self.body}\nLinks: {self.links}\nMailman Links: {self.mailman_links}"
 
     def to_json(self):
+        # PostgREST can't parse every Date header format, so send ISO 8601.
+        date = parse_date(self.date)
         return {
-            "created_at": self.date,
+            "created_at": _as_utc(date).isoformat() if date is not None else self.date,
             "email": self.from_,
             "name": self.subject,
             "description": self.body,
@@ -56,110 +63,135 @@ class Email:
             "can_self_pickup": self.can_self_pickup,
             "mailing_list": self.mailing_list,  # Include mailing list in JSON
             "photo_urls": self.mailman_links,
+            "photo_variants": self.photo_variants,
             "other_urls": self.links,
             "gmaps_location": self.gmaps_location,
             "gis_location": self.gis_location
         }
 
 
-def get_logs(login_url, url) -> tuple[str, str]:
-    # Initialize a session to maintain cookies and session state
-    session = requests.Session()
+# Bytes read from the archive response at a time.
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
 
-    # Data for the POST request (login form)
-    login_data = {
-        'username': username,
-        'password': password,
-        'submit': 'Let me in...'  # This matches what was in the form data in the image
-    }
+def get_logs(login_url, url, start_offset=0, etag=None) -> tuple[MboxStream, str]:
+    """
+    Start downloading a mailman archive.
 
-    # Perform the login
-    response = session.post(login_url, data=login_data)
+    Returns a MboxStream that parses messages as the bytes arrive, and the
+    mailing list name, or None if the archive doesn't exist. Any other
+    failure raises, so callers never mistake it for a missing month.
 
+    With start_offset and etag from a previous read, only the bytes after
+    start_offset are requested, and only if the archive has changed. The
+    stream is empty when nothing is new. Its offsets always count from the
+    start of the archive, so callers should still pass start_offset to
+    messages() in case the server sent the whole file.
+    """
     mailing_list = login_url[40:-1]
 
-    # Retry mechanism
-    max_retries = 3
-    for attempt in range(max_retries):
-        response = session.get(url, stream=True)
-        if response.status_code == 200:
-            print('Download successful.')
-            s = response.content.decode('utf-8')
-            return (s, mailing_list)
-        else:
-            print(f'Download failed. Attempt {attempt + 1} of {max_retries}.')
-            if attempt < max_retries - 1:
-                print('Retrying...')
-            else:
-                print('Max retries reached. Download failed.')
-                return None
-
-    # If all retries fail
-    return None
-
-
-def get_image_from_mailman_link(login_url, url) -> str:
-    # Initialize a session to maintain cookies and session state
-    session = requests.Session()
-
-    # Data for the POST request (login form)
-    login_data = {
-        'username': username,
-        'password': password,
-        'submit': 'Let me in...'
-    }
-
-    # Perform the login
-    response = session.post(login_url, data=login_data)
-
-    # Retry mechanism
-    max_retries = 3
-    for attempt in range(max_retries):
-        response = session.get(url, stream=True)
-        if response.status_code == 200:
-            print('Download successful.')
-            image_bytes = response.content
-            # Compress and resize the image
-            with Image.open(io.BytesIO(image_bytes)) as img:
-                img.thumbnail((720, 720))  # Resize image to at most 720p
-
-                # Generate a UUID for the image
-                image_uuid = uuid.uuid4()
-                file_path = f"{image_uuid}.jpg"  # Use UUID as the file name
-
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                    img.save(temp_file, format='JPEG')
-                    temp_file_path = temp_file.name
-
-                try:
-                    # Upload image to Supabase storage
-                    bucket_name = "item_photos"
-                    with open(temp_file_path, 'rb') as f:
-                        file_options = {
-                            "content-type": "image/jpeg"
-                        }
-                        supabase.storage.from_(bucket_name).upload(
-                            file_path, f, file_options=file_options)
-                    print(
-                        f'Image uploaded to {bucket_name} with UUID {image_uuid}.')
-                    return file_path
-                finally:
-                    # Clean up the temporary file
-                    os.unlink(temp_file_path)
-        else:
-            print(f'Download failed. Attempt {attempt + 1} of {max_retries}.')
-            if attempt < max_retries - 1:
-                print('Retrying...')
-            else:
-                print('Max retries reached. Download failed.')
-                return None
-
-    # If all retries fail
-    return None
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    # Byte ranges only line up with message offsets in the uncompressed archive.
+    if start_offset and not url.endswith('.gz'):
+        headers['Range'] = f'bytes={start_offset}-'
+        headers['Accept-Encoding'] = 'identity'
+
+    response = mailman_sessions.get(login_url, url, stream=True, headers=headers)
+    if response.status_code in (304, 416):
+        print('No new messages.')
+        response.close()
+        return (MboxStream([], start_offset, etag), mailing_list)
+    if response.status_code in (200, 206):
+        print('Download started.')
+        base_offset = start_offset if response.status_code == 206 else 0
+        stream = MboxStream(
+            response.iter_content(chunk_size=ARCHIVE_CHUNK_SIZE),
+            base_offset, response.headers.get('ETag'))
+        return (stream, mailing_list)
+
+    response.close()
+    if response.status_code == 404:
+        return None
+    print(f'Download failed with status {response.status_code}.')
+    response.raise_for_status()
+    raise requests.HTTPError(
+        f'Unexpected status {response.status_code} for {url}', response=response)
+
+
+# Uploads run on their own threads so every size of an image goes up at once.
+_upload_pool = ThreadPoolExecutor(max_workers=SERVICE_LIMITS["supabase"])
+
+
+def upload_photo(file_path: str, data: bytes, bucket_name: str = "item_photos"):
+    with limit("supabase"):
+        # Object names are content hashes, so overwriting one is harmless
+        # and makes re-uploading after a lost index succeed.
+        file_options = {
+            "content-type": images.content_type(),
+            "upsert": "true"
+        }
+        supabase.storage.from_(bucket_name).upload(
+            file_path, data, file_options=file_options)
+
+
+def upload_variants(stem: str, encoded: Dict[str, bytes]) -> Dict[str, str]:
+    """Upload every variant of one image at once; return {variant name: path}."""
+    paths = {name: images.variant_path(stem, name) for name in encoded}
+    uploads = [_upload_pool.submit(upload_photo, paths[name], data)
+               for name, data in encoded.items()]
+    for upload in uploads:
+        upload.result()
+    return paths
+
+
+def store_image(image_bytes: bytes) -> Tuple[str, Dict[str, str]]:
+    """Store every variant of an image unless it's already stored; return its main path and {variant name: path}."""
+    # Photos are stored under the hash of their source bytes, so a forwarded
+    # listing's attachment is found here without decoding it again.
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    wanted = {name for name, _ in images.IMAGE_VARIANTS}
+    existing = photo_index.find_exact(content_hash)
+    if existing is not None and wanted <= set(existing[1]):
+        return existing
+
+    # Resize and re-encode in memory; the largest size is what the item links to.
+    encoded, image_hash = images.transcode_in_pool(image_bytes)
+    existing = photo_index.find_similar(image_hash)
+    if existing is not None and wanted <= set(existing[1]):
+        photo_index.add(content_hash, image_hash, *existing, uploaded=False)
+        return existing
+
+    variants = upload_variants(content_hash, encoded)
+    file_path = variants[images.MAIN_VARIANT]
+    photo_index.add(content_hash, image_hash, file_path, variants)
+    print(f'Image uploaded to item_photos as {file_path}.')
+    return file_path, variants
+
+
+def get_image_from_mailman_link(login_url, url) -> Optional[Tuple[str, Dict[str, str]]]:
+    """Store an attachment; return its main path and {variant name: path}, or None."""
+    response = mailman_sessions.get(login_url, url)
+    if response.status_code != 200:
+        print(f'Download failed with status {response.status_code}.')
+        return None
+
+    print('Download successful.')
+    return store_image(response.content)
 
 
 def get_location_and_can_self_pickup(email_body: str) -> Tuple[str, bool]:
+    # Plainly stated locations are resolved without asking the model.
+    location, location_confidence = location_rules.extract_location(email_body)
+    can_self_pickup, pickup_confidence = location_rules.extract_can_self_pickup(
+        email_body)
+    if min(location_confidence, pickup_confidence) >= location_rules.RULES_MIN_CONFIDENCE:
+        location_rules.record(resolved=True)
+        print("Building: ", location, "Can self-pickup: ", can_self_pickup)
+        return location, can_self_pickup
+    location_rules.record(resolved=False)
+
     try:
         # Prepare the message for ChatGPT
         system_prompt_1 = """You are a helpful assistant that extracts pick-up locations and whether the user can self-pickup from email bodies. Do not include any other text in the response. Return the location and a boolean for whether the user can self-pickup. If the location is not found, return "Location not found, False".
@@ -172,13 +204,7 @@ def get_location_and_can_self_pickup(email_body: str) -> Tuple[str, bool]:
         ]
 
         # Make the API call to ChatGPT
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages
-        )
-
-        # Extract the assistant's reply
-        content = response.choices[0].message.content
+        content = complete(messages)
         last_comma_index = content.rfind(',')
         location = content[:last_comma_index].strip()
         can_self_pickup = content[last_comma_index + 1:].strip() == 'True'
@@ -211,7 +237,7 @@ def get_location_and_can_self_pickup(email_body: str) -> Tuple[str, bool]:
 
     except Exception as e:
         print(f"Error in parsing body with ChatGPT: {str(e)}")
-        return "Location not found"
+        return "Location not found", False
 
 
 def check_img_url(url):
@@ -247,11 +273,7 @@ def get_name_addr_from_line(line):
     else:
         # Ask GPT-4 to fetch the name and email address
         prompt = f"Extract the name and email address from this string: '{email_from}'. Format the response as 'Name: [name], Email: [email]'"
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        result = response.choices[0].message.content
+        result = complete([{"role": "user", "content": prompt}])
         name_match = re.search(r'Name: (.+),', result)
         email_match = re.search(r'Email: (.+)', result)
         if name_match and email_match:
@@ -277,153 +299,202 @@ def get_subj_and_mailing_list_from_line(line):
 def is_opportunity(subject, body):
     return True
     prompt = f"Check if this email is confirming that something is claimed. If it is saying something is claimed, return 'False'. Otherwise if it is describing or providing something new, return 'True'. Here is the email: Subject: {subject} Body: {body} Is this offering or describing something? Format the response as 'True' or 'False'."
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    result = response.choices[0].message.content
+    result = complete([{"role": "user", "content": prompt}])
     if result.lower() == "false":
         print("Skipping non-opportunity email: ", body)
         return False
     return True
 
 
-def parse_logs(log_text: str, mailing_list: str) -> List[Email]:
+# Regular expression pattern to match URLs
+url_pattern = re.compile(
+    r'https?://(?:www\.)?[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)'
+)
+
+
+def split_emails(log_text: str) -> List[str]:
     # Split the log text into individual emails
-    emails = []
-    current_email = []
-    inside_digest = False
-
-    for line in log_text.splitlines():
-        if inside_digest:
-            if line.startswith("End of Reuse Digest"):
-                inside_digest = False
+    return [email_text for _, email_text in iter_messages((0, line) for line in log_text.splitlines())]
+
+
+def parse_email(email_text: str, mailing_list: str) -> Email:
+    """
+    Parse one raw email into an Email, or return None if it should be skipped.
+
+    Location and self-pickup are left for enrich_email, and attachments for
+    upload_images.
+    """
+    sender_name = ""
+    email_from = email_date = email_subject = None
+    lines = email_text.split('\n')
+    body_lines = []
+    in_body = False
+    is_useless = False
+
+    attachment_links = []
+    in_attachments = False
+
+    for line in lines:
+        if is_useless:
+            break
+        if line.startswith('From:'):
+            email_from, sender_name = get_name_addr_from_line(line)
+
+        elif line.startswith('Date:'):
+            email_date = line[5:].strip()
+
+        elif line.startswith('Subject:'):
+            email_subject, _ = get_subj_and_mailing_list_from_line(
+                line)
+            if email_subject.startswith(('Reuse Digest', 'Fwd:', 'Re:')):
+                is_useless = True
+                break
+        elif line.startswith('Message-ID:'):
             continue
-        words = line.split()
-        if len(words) >= 3 and words[0] == "From:":
-            if words[1] == "Reuse":
-                inside_digest = True
+        elif line.startswith('In-Reply-To:'):
+            is_useless = True
+            break
+        elif not line.strip() and not in_body:
+            in_body = True
+        elif in_body:
+            if line == "-------------- next part --------------" or line.endswith("attachment was scrubbed...") or line.startswith("Get Outlook for"):
+                in_body = False
+                in_attachments = True
                 continue
+            body_lines.append(line)
+        elif in_attachments:
+            attachment_links += [link for link in url_pattern.findall(
+                line) if check_img_url(link)]
+
+    # Post-processing
+    if is_useless:
+        return None
+    if email_from is None or email_date is None or email_subject is None:
+        # Leftovers of a digest or a truncated message rather than a post.
+        return None
 
-            if current_email:
-                emails.append('\n'.join(current_email))
-                current_email = []
-            current_email.append(line)
-        elif len(words) >= 3 and words[0] == "From" and words[2] == "at":
-            pass
-        else:
-            current_email.append(line)
+    existence = check_existence(email_date, email_subject)
+    if existence is None:
+        print("Couldn't parse date, moving on.")
+        return None
+    if existence:
+        return None
 
-    if current_email:
-        emails.append('\n'.join(current_email))
+    email_body = '\n'.join(body_lines).strip()
+    if not is_opportunity(email_subject, email_body):
+        return None
 
-    parsed_emails = []
-    for email_text in emails[-30:]:
-        sender_name = ""
-        lines = email_text.split('\n')
-        body_lines = []
-        in_body = False
-        exists = False
-        is_useless = False
-
-        attachment_links = []
-        in_attachments = False
-
-        # Regular expression pattern to match URLs
-        url_pattern = re.compile(
-            r'https?://(?:www\.)?[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)'
-        )
-
-        for line in lines:
-            if is_useless or exists:
-                break
-            if line.startswith('From:'):
-                email_from, sender_name = get_name_addr_from_line(line)
-
-            elif line.startswith('Date:'):
-                email_date = line[5:].strip()
-
-            elif line.startswith('Subject:'):
-                email_subject, _ = get_subj_and_mailing_list_from_line(
-                    line)
-                if email_subject.startswith(('Reuse Digest', 'Fwd:', 'Re:')):
-                    is_useless = True
-                    break
-                if check_existence(email_date, email_subject):
-                    exists = True
-                if check_existence(email_date, email_subject) is None:
-                    print("Couldn't parse date, moving on.")
-                    is_useless = True
-                    break
-            elif line.startswith('Message-ID:'):
+    email = Email(email_subject, email_from,
+                  email_date, email_body, "", mailing_list, False, sender_name)
+
+    # Find all links in the email body, excluding specific domains
+    email.links = [
+        link for link in url_pattern.findall(email_body)
+        if check_img_url(link)
+    ] + attachment_links
+
+    # # Remove text after and including the separator if present in the email body
+    # separator = "________________________________"
+    # if separator in email.body:
+    #     email.body = email.body.split(separator)[0].strip()
+
+    return email
+
+
+def upload_images(email: Email) -> Email:
+    """Move mailman-hosted attachments into Supabase storage."""
+    other_links = []
+    for link in email.links:
+        if link.startswith(('http://mailman.mit.edu', 'https://mailman.mit.edu')) and ("/free-foods/" in link or "/reuse/" in link):
+            if "/free-foods/" in link:
+                login_url = free_foods_login_url
+            elif "/reuse/" in link:
+                login_url = reuse_login_url
+            try:
+                stored = get_image_from_mailman_link(login_url, link)
+                if stored is None:
+                    raise Exception("download failed")
+                file_path, variants = stored
+                bucket = supabase.storage.from_('item_photos')
+                email.mailman_links.append(bucket.get_public_url(file_path))
+                email.photo_variants.append({
+                    name: bucket.get_public_url(path) for name, path in variants.items()
+                })
                 continue
-            elif line.startswith('In-Reply-To:'):
-                is_useless = True
+            except Exception as e:
+                warnings.warn(
+                    f"Failed to upload image for link '{link}' to Supabase: {e}")
+        other_links.append(link)
+    email.links = other_links
+    return email
+
+
+def normalize_subject(subject: str) -> str:
+    return " ".join(subject.casefold().split())
+
+
+def date_timestamp(date_str: str) -> float:
+    # Unparseable dates sort last, so any dated copy wins.
+    date = parse_date(date_str)
+    return _as_utc(date).timestamp() if date is not None else float("inf")
+
+
+def email_timestamp(email: Email) -> float:
+    return date_timestamp(email.date)
+
+
+def remove_duplicate_subjects(emails: List[Email]) -> List[Email]:
+    """Keep only the earliest email for each subject."""
+    return keep_best(emails, key=lambda email: normalize_subject(email.subject), rank=email_timestamp)
+
+
+def message_headers(email_text: str) -> Tuple[Optional[str], Optional[str]]:
+    """(subject, date) from a raw email's headers, read the way parse_email reads them."""
+    subject = date = None
+    started = False
+    for line in email_text.split('\n'):
+        if not line.strip():
+            if started:
                 break
-            elif not line.strip() and not in_body:
-                in_body = True
-            elif in_body:
-                if line == "-------------- next part --------------" or line.endswith("attachment was scrubbed...") or line.startswith("Get Outlook for"):
-                    in_body = False
-                    in_attachments = True
-                    continue
-                body_lines.append(line)
-            elif in_attachments:
-                attachment_links += [link for link in url_pattern.findall(
-                    line) if check_img_url(link)]
-
-        # Post-processing
-        if is_useless or exists:
             continue
+        started = True
+        if line.startswith('Date:'):
+            date = line[5:].strip()
+        elif line.startswith('Subject:'):
+            subject, _ = get_subj_and_mailing_list_from_line(line)
+    return subject, date
 
-        email_body = '\n'.join(body_lines).strip()
-        if not is_opportunity(email_subject, email_body):
-            continue
 
-        email_location, can_self_pickup = get_location_and_can_self_pickup(
-            email_body)
-        email = Email(email_subject, email_from,
-                      email_date, email_body, email_location, mailing_list, can_self_pickup, sender_name)
-
-        # Find all links in the email body, excluding specific domains
-        email.links = [
-            link for link in url_pattern.findall(email_body)
-            if check_img_url(link)
-        ] + attachment_links
-
-        for i, link in enumerate(email.links):
-            if link.startswith(('http://mailman.mit.edu', 'https://mailman.mit.edu')) and ("/free-foods/" in link or "/reuse/" in link):
-                if "/free-foods/" in link:
-                    login_url = free_foods_login_url
-                elif "/reuse/" in link:
-                    login_url = reuse_login_url
-                try:
-                    public_url = supabase.storage.from_('item_photos').get_public_url(
-                        get_image_from_mailman_link(login_url, link))
-                    email.mailman_links.append(public_url)
-                    email.links.pop(i)
-                except Exception as e:
-                    warnings.warn(
-                        f"Failed to upload image for link '{link}' to Supabase: {e}")
-
-        # # Remove text after and including the separator if present in the email body
-        # separator = "________________________________"
-        # if separator in email.body:
-        #     email.body = email.body.split(separator)[0].strip()
-
-        parsed_emails.append(email)
-
-    emails = []
-    for email in parsed_emails:
-        is_duplicate = False
-        for other_email in parsed_emails:
-            if email.subject == other_email.subject and email.date > other_email.date:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            emails.append(email)
+def duplicate_message_filter():
+    """
+    Pipeline stage form of remove_duplicate_subjects for raw (offset, text)
+    messages, keyed on their Subject and Date headers.
 
-    return emails
+    It goes before the parallel parse so it sees messages in archive order;
+    which copy of a double post gets through doesn't depend on which parse
+    worker finished first.
+    """
+    earliest = best_so_far(key=lambda headers: normalize_subject(headers[0]),
+                           rank=lambda headers: date_timestamp(headers[1]))
+
+    def stage(message):
+        subject, date = message_headers(message[1])
+        if subject is None or date is None:
+            # Left for parse_email to skip.
+            return message
+        return message if earliest((subject, date)) is not None else None
+
+    return stage
+
+
+def parse_logs(email_texts: Iterable[str], mailing_list: str) -> List[Email]:
+    parsed_emails = []
+    for email_text in email_texts:
+        email = parse_email(email_text, mailing_list)
+        if email is not None:
+            parsed_emails.append(upload_images(email))
+
+    return remove_duplicate_subjects(parsed_emails)
 
 
 def parse_date(date_str, default=None):
@@ -449,44 +520,138 @@ def parse_date(date_str, default=None):
     return default
 
 
+def _as_utc(date: datetime) -> datetime:
+    # Dates without an offset are stored by Postgres as UTC.
+    if date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+class ExistenceIndex:
+    """
+    In-memory index of the (name, created_at) keys already in the items table.
+
+    Keys are fetched with one narrow query per stretch of time and grown in
+    EXISTENCE_PRELOAD steps, so a month-long archive costs a handful of
+    queries rather than one full-row query per email.
+    """
+
+    # How far either side of an email's date a same-named item counts as a duplicate.
+    WINDOW = timedelta(weeks=1)
+    # Extra span loaded whenever the index has to grow.
+    EXISTENCE_PRELOAD = timedelta(weeks=4)
+    PAGE_SIZE = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = None
+        self.end = None
+        self.dates_by_name = defaultdict(list)
+
+    def _load(self, start: datetime, end: datetime):
+        # Pages by keyset on (created_at, id): offsets get slower with every
+        # page and skip or repeat rows when items are inserted meanwhile.
+        last = None
+        while True:
+            query = supabase.table("items").select("id, name, created_at").gte(
+                "created_at", start.isoformat()).lt("created_at", end.isoformat())
+            if last is not None:
+                query = after_key(query, last['created_at'], last['id'], desc=False)
+            with limit("supabase"):
+                result = query.order("created_at").order("id").limit(self.PAGE_SIZE).execute()
+            for row in result.data:
+                self.dates_by_name[row['name']].append(
+                    _as_utc(datetime.fromisoformat(row['created_at'])))
+            if len(result.data) < self.PAGE_SIZE:
+                return
+            last = result.data[-1]
+
+    def _cover(self, start: datetime, end: datetime):
+        if self.start is None:
+            self._load(start, end + self.EXISTENCE_PRELOAD)
+            self.start, self.end = start, end + self.EXISTENCE_PRELOAD
+            return
+        if start < self.start:
+            new_start = start - self.EXISTENCE_PRELOAD
+            self._load(new_start, self.start)
+            self.start = new_start
+        if end > self.end:
+            new_end = end + self.EXISTENCE_PRELOAD
+            self._load(self.end, new_end)
+            self.end = new_end
+
+    def find(self, date: datetime, subject: str):
+        """Return the created_at of a same-named item within WINDOW of date, or None."""
+        date = _as_utc(date)
+        with self.lock:
+            self._cover(date - self.WINDOW, date + self.WINDOW)
+            for created_at in self.dates_by_name.get(subject, ()):
+                if abs(created_at - date) <= self.WINDOW:
+                    return created_at
+        return None
+
+    def add(self, date: datetime, subject: str):
+        with self.lock:
+            self.dates_by_name[subject].append(_as_utc(date))
+
+
+existence_index = ExistenceIndex()
+
+
 def check_existence(date_str, subject):
     # Parse the date string into a datetime object with a fallback to the current date
     date = parse_date(date_str)
     if date is None:
         return None
 
-    # Calculate the start and end of the one-week window before and after the date
-    start_date = date - timedelta(weeks=1)
-    end_date = date + timedelta(weeks=1)
-
-    # Convert the start and end dates back to strings for the database query (if needed)
-    start_date_str = start_date.strftime("%Y-%m-%d %H:%M:%S")
-    end_date_str = end_date.strftime("%Y-%m-%d %H:%M:%S")
-
     # Check if there is an entry within the one-week window with the same name
-    result = supabase.table("items").select(
-        "*").gte("created_at", start_date_str).lte("created_at", end_date_str).execute()
-
-    # If any rows are returned, check if the name is the same
-    for row in result.data:
-        if row['name'] == subject:
-            print(
-                f"Email with subject '{subject}' from {row['created_at']} already exists within one week.")
-            return True
+    created_at = existence_index.find(date, subject)
+    if created_at is not None:
+        print(
+            f"Email with subject '{subject}' from {created_at} already exists within one week.")
+        return True
 
     return False
 
 
-def write_to_db(email: Email):
+def enrich_email(email: Email) -> Email:
     email_location, can_self_pickup = get_location_and_can_self_pickup(
         email.subject + "\n" + email.body)
     email.location = email_location
     email.gmaps_location = get_address_from_desc(email_location)
     email.gis_location = get_gis_from_address(email.gmaps_location)
     email.can_self_pickup = can_self_pickup
+    return email
+
+
+def _record_written(rows: List[dict], inserted: List[dict]):
+    for row in rows:
+        existence_index.add(datetime.fromisoformat(row["created_at"]), row["name"])
+    publish_items_created(inserted)
+
+
+# Items are written in batches. (name, created_at) is unique, so writing a
+# post that is already stored is a no-op. Rows the database refuses are kept
+# in rejected_items.jsonl rather than retried on every run.
+item_writer = BatchWriter(
+    supabase, "items", on_conflict="name,created_at", on_written=_record_written,
+    rejected_path=os.path.join(CACHE_DIR, "rejected_items.jsonl"))
+
+
+def insert_email(email: Email) -> None:
+    """
+    Queue the email's item for the next batch; item_writer.close() writes the rest.
+
+    Returns nothing, so as the last pipeline stage it leaves no results behind.
+    """
     email_json = email.to_json()
     print(email_json)
-    supabase.table("items").insert(email.to_json()).execute()
+    item_writer.add(email_json)
+
+
+def write_to_db(email: Email):
+    insert_email(enrich_email(email))
+    item_writer.flush()
 
 
 if __name__ == "__main__":
@@ -494,8 +659,9 @@ if __name__ == "__main__":
     login_url = 'https://mailman.mit.edu/mailman/private/reuse/'
     supabase.table("items").delete().neq(
         'id', '00000000-0000-0000-0000-000000000000').execute()
-    log_text, mailing_list = get_logs(login_url, url)
-    emails = parse_logs(log_text, mailing_list)
+    stream, mailing_list = get_logs(login_url, url)
+    emails = parse_logs(
+        (email_text for _, email_text in stream.messages()), mailing_list)
     for email in emails[:1]:
         print(email)
         print("———————————————————————————————————————————————————————————")
@@ -0,0 +1,190 @@
+"""
+Background delivery for outbound mail.
+
+Request handlers call ``mail_dispatcher.enqueue(...)`` and return straight
+away. One worker task drains the queue in batches over a single long-lived,
+authenticated SMTP session. The session is reopened when the server drops
+it, and failed messages are retried with exponential backoff. A message
+waiting out its backoff still counts as pending, so ``stop()`` waits for it
+too.
+"""
+import asyncio
+import os
+import smtplib
+from dataclasses import dataclass
+
+import anyio
+from dotenv import load_dotenv
+
+from backend.mailer.utils import build_message
+
+load_dotenv()
+
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "2"))
+# Servers drop idle sessions after a few minutes; close ours first.
+MAIL_IDLE_TIMEOUT_SECONDS = float(os.getenv("MAIL_IDLE_TIMEOUT_SECONDS", "60"))
+
+
+@dataclass
+class MailJob:
+    to_address: str
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+class SMTPSession:
+    """One authenticated SMTP connection, opened on demand and reused."""
+
+    def __init__(self, host, port, user, password, use_tls=True):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.server = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv('SMTP_HOST'),
+            int(os.getenv('SMTP_PORT', '587')),
+            os.getenv('SMTP_USER'),
+            os.getenv('SMTP_PASSWORD'),
+        )
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self.server = server
+
+    def send(self, job: MailJob):
+        if self.server is None:
+            self.connect()
+        message = build_message(job.to_address, job.subject, job.body, self.user)
+        try:
+            self.server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed a session we thought was open; retry once on a fresh one.
+            self.connect()
+            self.server.send_message(message)
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.server = None
+
+
+class MailDispatcher:
+    def __init__(self, session: SMTPSession, batch_size=MAIL_BATCH_SIZE,
+                 max_attempts=MAIL_MAX_ATTEMPTS, retry_base=MAIL_RETRY_BASE_SECONDS,
+                 idle_timeout=MAIL_IDLE_TIMEOUT_SECONDS):
+        self.session = session
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_timeout = idle_timeout
+        self.queue = None
+        self.worker = None
+        # Tasks holding failed jobs until their backoff ends.
+        self.retries = set()
+        self.sent = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        # The queue and worker have to be created inside the running loop.
+        if self.worker is None or self.worker.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    def enqueue(self, to_address, subject, body):
+        """Queue a message for delivery. Must be called from the event loop."""
+        self._ensure_started()
+        self.queue.put_nowait(MailJob(to_address, subject, body))
+
+    async def _run(self):
+        while True:
+            try:
+                job = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                await anyio.to_thread.run_sync(self.session.close)
+                continue
+
+            batch = [job]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            failures = await anyio.to_thread.run_sync(self._send_batch, batch)
+            for job, error in failures:
+                self._retry_later(job, error)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _send_batch(self, batch):
+        failures = []
+        for job in batch:
+            try:
+                self.session.send(job)
+                self.sent += 1
+                print(f"Email sent to {job.to_address}")
+            except (smtplib.SMTPException, OSError) as e:
+                failures.append((job, e))
+                # Start the next message on a clean session.
+                self.session.close()
+        return failures
+
+    def _retry_later(self, job: MailJob, error: Exception):
+        job.attempts += 1
+        if job.attempts >= self.max_attempts:
+            self.failed += 1
+            print(
+                f"Giving up on email to {job.to_address} after {job.attempts} attempts: {error}")
+            return
+        delay = self.retry_base * 2 ** (job.attempts - 1)
+        print(
+            f"Failed to send email to {job.to_address}: {error}. Retrying in {delay:.0f}s.")
+        # Created before the batch is marked done, so the queue never looks
+        # drained while this job is still owed another attempt.
+        retry = asyncio.get_running_loop().create_task(self._requeue(job, delay))
+        self.retries.add(retry)
+        retry.add_done_callback(self.retries.discard)
+
+    async def _requeue(self, job: MailJob, delay: float):
+        await asyncio.sleep(delay)
+        self.queue.put_nowait(job)
+
+    async def _drain(self):
+        # A retry puts its job back on the queue before it leaves self.retries,
+        # so the two are never both empty while mail is pending.
+        while True:
+            await self.queue.join()
+            if not self.retries:
+                return
+            await asyncio.wait(set(self.retries))
+
+    async def stop(self, timeout: float = 10):
+        """Wait briefly for queued and retrying mail to go out, then close the session."""
+        if self.worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Shutting down with {self.queue.qsize() + len(self.retries)} unsent emails.")
+        for retry in list(self.retries):
+            retry.cancel()
+        self.worker.cancel()
+        self.worker = None
+        await anyio.to_thread.run_sync(self.session.close)
+
+
+mail_dispatcher = MailDispatcher(SMTPSession.from_env())
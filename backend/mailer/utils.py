@@ -7,6 +7,15 @@ import warnings
 # Load environment variables from .env file
 load_dotenv()
 
+def build_message(to_address, subject, body, from_address):
+    message = EmailMessage()
+    message.set_content(body)
+    message['Subject'] = subject
+    message['From'] = from_address
+    message['To'] = to_address
+    return message
+
+
 def send_email(to_address, subject, body):
     # Get SMTP credentials from environment variables
     smtp_host = os.getenv('SMTP_HOST')
@@ -15,11 +24,7 @@ def send_email(to_address, subject, body):
     smtp_password = os.getenv('SMTP_PASSWORD')
 
     # Create an email message
-    message = EmailMessage()
-    message.set_content(body)
-    message['Subject'] = subject
-    message['From'] = smtp_user
-    message['To'] = to_address
+    message = build_message(to_address, subject, body, smtp_user)
 
     try:
         # Connect to the SMTP server and send the email
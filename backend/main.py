@@ -1,31 +1,43 @@
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
+import hmac
+import json
 import os
-from fastapi import Depends, FastAPI, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, UploadFile, File, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from backend.auth_middleware import get_current_user
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import Annotated, Optional, List
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from backend.mailer import utils as mailerutils
+from backend.mailer.dispatcher import mail_dispatcher
+from backend.cache import cache
+from backend.events import EVENT_TYPES, event_broker
+import re
+from backend.repository import supabase, execute, get_users_by_ids, after_cursor, encode_cursor, USER_COLUMNS
 
 from backend.auth_middleware import AuthMiddleware
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-
 DIST_PATH = os.getenv("DIST_PATH")
+# Shared secret the listener sends to /internal/publish-events
+EVENTS_PUBLISH_TOKEN = os.getenv("EVENTS_PUBLISH_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Give queued notifications a chance to go out before the worker exits.
+    await mail_dispatcher.stop()
+
 
 # FastAPI app instance
-app = FastAPI(title="app")
+app = FastAPI(title="app", lifespan=lifespan)
 app.add_middleware(AuthMiddleware)
 api = FastAPI(title="existing api")
 
@@ -71,14 +83,23 @@ class BidInput(BaseModel):
     pass
 
 
+class EventInput(BaseModel):
+    type: str
+    data: dict
+    item_id: Optional[str] = None
+
+
+class PublishEventsInput(BaseModel):
+    events: List[EventInput]
+
+
 # Create user: given email, set karma to 0
 @api.post("/create-user")
 async def create_user(data: CreateUserInput):
     try:
-        response = (
+        response = await execute(
             supabase.table("users")
             .insert({"email": data.email, "karma": 0.0})
-            .execute()
         )
 
         return {"message": "User created successfully", "data": response}
@@ -90,7 +111,7 @@ async def create_user(data: CreateUserInput):
 @api.post("/create-new-transaction")
 async def create_new_transaction(data: CreateTransactionInput):
     try:
-        response = (
+        response = await execute(
             supabase.table("transactions")
             .insert(
                 {
@@ -99,7 +120,6 @@ async def create_new_transaction(data: CreateTransactionInput):
                     "item_id": data.item_id,
                 }
             )
-            .execute()
         )
 
         return {
@@ -122,7 +142,7 @@ async def create_item(data: ItemInput, request: Request):
 
     try:
         # Insert item data into the items table
-        response = (
+        response = await execute(
             supabase.table("items")
             .insert({
                 "seller_id": seller_id,
@@ -136,8 +156,10 @@ async def create_item(data: ItemInput, request: Request):
                 "email": seller_email,
                 "price": data.price,
             })
-            .execute()
         )
+        await cache.invalidate_prefix("search:")
+        for item in response.data:
+            event_broker.publish("item-created", item, item["id"])
 
         return {"message": "Item created successfully", "data": response}
     except Exception as e:
@@ -153,22 +175,27 @@ async def bid_for_item(item_id: str, request: Request):
     bidder_id = bidder['sub']
 
     try:
-        existing_bid = supabase.table("bids").select("id").eq(
-            "bidder_id", bidder_id).eq("item_id", item_id).execute()
+        existing_bid = await execute(supabase.table("bids").select("id").eq(
+            "bidder_id", bidder_id).eq("item_id", item_id))
 
         if existing_bid.data:
             raise HTTPException(
                 status_code=400, detail="Bidder has already placed a bid on this item.")
         # Insert bid data into the bids table
-        supabase.table("bids")\
+        inserted = await execute(
+            supabase.table("bids")
             .insert({
                 "bidder_id": bidder_id,
                 "created_at": datetime.now().isoformat(),
                 "item_id": item_id,
-            })\
-            .execute()
-        response = supabase.table("bids").select(
-            "*").eq("item_id", item_id).execute()
+            })
+        )
+        await cache.invalidate(f"bids:{item_id}")
+        await cache.invalidate_prefix(f"item:{item_id}:")
+        for bid in inserted.data:
+            event_broker.publish("bid-created", bid, item_id)
+        response = await execute(supabase.table("bids").select(
+            "*").eq("item_id", item_id))
 
         return {"message": "Bid created successfully", "data": response.data}
 
@@ -185,10 +212,14 @@ async def cancel_bid(item_id: str, request: Request):
     bidder_id = bidder['sub']
     try:
         # Insert bid data into the bids table
-        supabase.table("bids").delete().eq(
-            "item_id", item_id).eq("bidder_id", bidder_id).execute()
-        response = supabase.table("bids").select(
-            "*").eq("item_id", item_id).execute()
+        deleted = await execute(supabase.table("bids").delete().eq(
+            "item_id", item_id).eq("bidder_id", bidder_id))
+        await cache.invalidate(f"bids:{item_id}")
+        await cache.invalidate_prefix(f"item:{item_id}:")
+        for bid in deleted.data:
+            event_broker.publish("bid-cancelled", bid, item_id)
+        response = await execute(supabase.table("bids").select(
+            "*").eq("item_id", item_id))
         return {"message": "Bid deleted successfully", "data": response.data}
 
     except Exception as e:
@@ -198,25 +229,27 @@ async def cancel_bid(item_id: str, request: Request):
 @ api.get("/get-bids-for-item/{item_id}")
 async def get_bids_for_item(item_id: str):
     try:
-        response = supabase.table("bids").select(
-            "*").eq("item_id", item_id).execute()
-        return {"message": "Bids retrieved successfully", "data": response.data}
+        async def load():
+            response = await execute(supabase.table("bids").select(
+                "*").eq("item_id", item_id))
+            return response.data
+
+        bids = await cache.get_or_load(f"bids:{item_id}", load)
+        return {"message": "Bids retrieved successfully", "data": bids}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @api.get("/get-multiple-users")
 async def get_multiple_users(userids: Annotated[str, Query()]):
-    result = []
     userids = userids.strip()
     if not len(userids):
         return {"message": "Multiple Users Found", "data": []}
-    for userid in userids.split(","):
-        query = supabase.table("users").select("*").eq("id", userid).execute()
-        result.append(
-            query.data[0] if query is not None and query.data
-            else None
-        )
+    try:
+        result = await get_users_by_ids(
+            [userid.strip() for userid in userids.split(",")])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {"message": "Multiple Users Found", "data": result}
 
 
@@ -224,8 +257,8 @@ async def get_multiple_users(userids: Annotated[str, Query()]):
 async def accept_bid(bid_id: str):
     try:
         # Check the current state of the bid before updating
-        existing_bid = supabase.table("bids").select(
-            "bidder_id", "accepted").eq("id", bid_id).execute()
+        existing_bid = await execute(supabase.table("bids").select(
+            "bidder_id", "accepted", "item_id").eq("id", bid_id))
 
         if not existing_bid.data or existing_bid.data[0]['accepted']:
             raise HTTPException(
@@ -234,21 +267,25 @@ async def accept_bid(bid_id: str):
         bidder_id = existing_bid.data[0]['bidder_id']
 
         # Update bid data in the bids table
-        response = (
+        response = await execute(
             supabase.table("bids")
             .update({
                 "accepted": True,
             })
             .eq("id", bid_id)  # Assuming bid_id is the identifier for the bid
-            .execute()
         )
+        item_id = existing_bid.data[0]['item_id']
+        await cache.invalidate(f"bids:{item_id}")
+        await cache.invalidate_prefix(f"item:{item_id}:")
+        event_broker.publish(
+            "bid-accepted", {"id": bid_id, "item_id": item_id, "bidder_id": bidder_id}, item_id)
 
         # Send an email to the user whose bid was accepted
-        user_email = supabase.table("users").select("email").eq(
-            "id", bidder_id).execute().data[0]['email']
+        user_email = (await execute(supabase.table("users").select("email").eq(
+            "id", bidder_id))).data[0]['email']
         subject = "Your Bid Has Been Accepted"
         body = f"Congratulations! Your bid for bid ID {bid_id} has been accepted."
-        mailerutils.send_email(user_email, subject, body)
+        mail_dispatcher.enqueue(user_email, subject, body)
 
         return {"message": "Bid updated successfully and email sent to the bidder", "data": response}
     except Exception as e:
@@ -263,8 +300,8 @@ async def review_user(bid_id: str, review: int, reviewee_id: str):
                 status_code=400, detail="Review must be between 1 and 5.")
 
         # Get the user associated with the bid
-        existing_bid = supabase.table("bids").select(
-            "bidder_id, item_id").eq("id", bid_id).execute()
+        existing_bid = await execute(supabase.table("bids").select(
+            "bidder_id, item_id").eq("id", bid_id))
         if not existing_bid.data:
             raise HTTPException(status_code=400, detail="Bid not found.")
 
@@ -272,8 +309,8 @@ async def review_user(bid_id: str, review: int, reviewee_id: str):
         item_id = existing_bid.data[0]['item_id']
 
         # Get the seller_id from the items table using the item_id
-        existing_item = supabase.table("items").select(
-            "seller_id").eq("id", item_id).execute()
+        existing_item = await execute(supabase.table("items").select(
+            "seller_id").eq("id", item_id))
         if not existing_item.data:
             raise HTTPException(status_code=400, detail="Item not found.")
 
@@ -286,11 +323,13 @@ async def review_user(bid_id: str, review: int, reviewee_id: str):
 
         # Adjust karma based on the review
         karma_adjustment = float(5*(review - 3))  # Assuming 3 is neutral
-        reviewee_row = supabase.table("users").select("*").eq("id", reviewee_id).execute()
+        reviewee_row = await execute(supabase.table("users").select("*").eq("id", reviewee_id))
 
-        response = supabase.table("users").update({
+        response = await execute(supabase.table("users").update({
             "karma": karma_adjustment + reviewee_row.data[0]["karma"]
-        }).eq("id", reviewee_id).execute()
+        }).eq("id", reviewee_id))
+        await cache.invalidate(f"user:{reviewee_id}")
+        await cache.invalidate_prefix("sellers:")
 
         return {"message": "User karma adjusted successfully", "data": response}
     except Exception as e:
@@ -300,8 +339,8 @@ async def review_user(bid_id: str, review: int, reviewee_id: str):
 @ api.get("/get-accepted-bids-as-seller/{user_id}")
 async def get_accepted_bids_as_seller(user_id: str):
     try:
-        response = supabase.table("bids").select(
-            "*").eq("seller_id", user_id).eq("accepted", True).execute()
+        response = await execute(supabase.table("bids").select(
+            "*").eq("seller_id", user_id).eq("accepted", True))
         return {"message": "Accepted bids retrieved successfully", "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -310,8 +349,8 @@ async def get_accepted_bids_as_seller(user_id: str):
 @ api.get("/get-accepted-bids-as-buyer/{user_id}")
 async def get_accepted_bids_as_buyer(user_id: str):
     try:
-        response = supabase.table("bids").select(
-            "*").eq("buyer_id", user_id).eq("accepted", True).execute()
+        response = await execute(supabase.table("bids").select(
+            "*").eq("buyer_id", user_id).eq("accepted", True))
         return {"message": "Accepted bids retrieved successfully", "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -321,10 +360,12 @@ async def get_accepted_bids_as_buyer(user_id: str):
 async def edit_item(item_id: str, data: ItemInput):
     try:
         # Update item data in the items table
-        response = (
+        response = await execute(
             supabase.table("items")
             .update({
                 "photo_urls": data.photo_urls,
+                # May no longer line up with photo_urls; the backfill remakes them.
+                "photo_variants": [],
                 "can_self_pickup": data.can_self_pickup,
                 "other_urls": data.other_urls,
                 "quality": data.quality,
@@ -334,8 +375,9 @@ async def edit_item(item_id: str, data: ItemInput):
                 "email": data.email
             })
             .eq("id", item_id)  # Assuming item_id is the identifier for the item
-            .execute()
         )
+        await cache.invalidate(f"item:{item_id}")
+        await cache.invalidate_prefix(f"item:{item_id}:", "search:")
 
         return {"message": "Item updated successfully", "data": response}
     except Exception as e:
@@ -345,8 +387,8 @@ async def edit_item(item_id: str, data: ItemInput):
 @ api.post("/get-user-karma/{user_id}")
 async def get_user_karma(user_id: str):
     try:
-        response = supabase.table("users").select(
-            "karma").eq("id", user_id).execute()
+        response = await execute(supabase.table("users").select(
+            "karma").eq("id", user_id))
         return {"message": "User karma retrieved successfully", "data": response.data[0]}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -359,17 +401,21 @@ async def get_user(user_id: str, request: Request):
 
     Returns:
         - message (str): Result message.
-        - data (dict): User information including id, username, email, karma, created_at, updated_at.
+        - data (dict): User information: id, name, email, pfp_url and karma.
     """
     try:
-        response = supabase.table("users").select(
-            "*").eq("id", user_id).execute()
+        async def load():
+            response = await execute(supabase.table("users").select(
+                USER_COLUMNS).eq("id", user_id))
+            return response.data
 
-        if len(response.data) == 0:
+        users = await cache.get_or_load(f"user:{user_id}", load)
+
+        if len(users) == 0:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Assuming the response contains a list of users
-        user_data = response.data[0]
+        user_data = users[0]
         return {
             "message": "User retrieved successfully",
             "data": user_data  # Return the entire user_data dictionary
@@ -377,60 +423,273 @@ async def get_user(user_id: str, request: Request):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Rows per PostgREST request when exporting items. Kept below PostgREST's
+# max-rows cap so a short batch reliably means the table is exhausted.
+EXPORT_BATCH_SIZE = 500
+
+
+async def _item_batches(columns: str, since: Optional[str]):
+    """
+    Yield every item, oldest first, in batches of EXPORT_BATCH_SIZE rows.
+
+    Pages by keyset on (created_at, id) so each batch is an index seek.
+    """
+    if columns.strip() == "*":
+        requested = None
+        select_columns = "*"
+    else:
+        requested = [column.strip() for column in columns.split(",") if column.strip()]
+        bad = [column for column in requested if not _column_pattern.match(column)]
+        if bad or not requested:
+            raise ValueError(f"Invalid columns: {', '.join(bad) or columns}.")
+        # The keyset columns are always fetched, and dropped again below.
+        select_columns = ",".join(dict.fromkeys(["id", "created_at", *requested]))
+
+    cursor = None
+    while True:
+        query = supabase.table("items").select(select_columns)
+        if since:
+            query = query.gt("created_at", since)
+        if cursor:
+            query = after_cursor(query, cursor, desc=False)
+        response = await execute(query.order("created_at").order("id").limit(EXPORT_BATCH_SIZE))
+
+        rows = response.data
+        if rows:
+            cursor = encode_cursor(rows[-1])
+            if requested is not None:
+                rows = [{column: row[column] for column in requested} for row in rows]
+            yield rows
+        if len(response.data) < EXPORT_BATCH_SIZE:
+            return
+
+
+async def _stream_items(columns: str, since: Optional[str], fmt: str) -> StreamingResponse:
+    if fmt not in ("json", "ndjson"):
+        raise ValueError("format must be 'json' or 'ndjson'.")
+
+    batches = _item_batches(columns, since)
+    # Fetch the first batch up front so bad columns or timestamps still
+    # surface as a 400 instead of a truncated stream.
+    try:
+        first_batch = await batches.__anext__()
+    except StopAsyncIteration:
+        first_batch = []
+
+    async def all_batches():
+        yield first_batch
+        async for batch in batches:
+            yield batch
+
+    async def ndjson_body():
+        async for batch in all_batches():
+            yield "".join(json.dumps(row) + "\n" for row in batch)
+
+    async def json_body():
+        # Same envelope as the other endpoints, written out a batch at a time.
+        yield '{"message": "Items retrieved successfully", "data": ['
+        separator = ""
+        async for batch in all_batches():
+            if batch:
+                yield separator + ",".join(json.dumps(row) for row in batch)
+                separator = ","
+        yield "]}"
+
+    if fmt == "ndjson":
+        return StreamingResponse(ndjson_body(), media_type="application/x-ndjson")
+    return StreamingResponse(json_body(), media_type="application/json")
+
+
 # Get all items ids
 
 
 @ api.get("/get-all-items-ids")
-async def get_all_items_ids():
+async def get_all_items_ids(since: Optional[str] = None, fmt: str = Query("json", alias="format")):
     """
     Get all item IDs from the database.
 
-    Returns a message and a list of item IDs.
+    Returns a message and a list of item IDs, streamed in batches.
+
+    Args:
+        since (str): Only include items created after this timestamp.
+        format (str): "json" (default) for the usual envelope, or "ndjson".
 
     Raises:
         HTTPException: If there is an error, a 400 status code is returned.
     """
     try:
-        response = supabase.table("items").select("id").execute()
-        return {"message": "Items retrieved successfully", "data": response.data}
+        return await _stream_items("id", since, fmt)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @ api.get("/get-all-items")
-async def get_all_items():
+async def get_all_items(columns: str = "*", since: Optional[str] = None, fmt: str = Query("json", alias="format")):
     """
     Get all items from the database.
 
-    Returns a message and a list of all items.
+    Returns a message and a list of all items, oldest first. The table is
+    read and streamed in batches, so large tables are neither held in
+    memory nor cut short by PostgREST's row cap.
+
+    Args:
+        columns (str): Comma-separated columns to return (default: all).
+        since (str): Only include items created after this timestamp, for
+            incremental sync.
+        format (str): "json" (default) for the usual envelope, or "ndjson"
+            for one item per line.
 
     Raises:
         HTTPException: If there is an error, a 400 status code is returned.
     """
     try:
-        response = supabase.table("items").select("*").execute()
-        return {"message": "Items retrieved successfully", "data": response.data}
+        return await _stream_items(columns, since, fmt)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+PHOTO_SIZES = ("small", "medium", "large")
+
+
+def _sized_photos(items: List[dict], photo_size: Optional[str]) -> List[dict]:
+    """
+    Point each item's photo_urls at the requested variant from photo_variants.
+
+    Photos without that variant yet keep their original URL. The rows are
+    copied, so cached responses stay untouched.
+    """
+    if photo_size is None:
+        return items
+    if photo_size not in PHOTO_SIZES:
+        raise ValueError(f"photo_size must be one of {', '.join(PHOTO_SIZES)}.")
+
+    sized = []
+    for item in items:
+        variants = item.get("photo_variants") or []
+        photo_urls = [
+            (variants[index].get(photo_size) if index < len(variants) else None) or url
+            for index, url in enumerate(item.get("photo_urls") or [])
+        ]
+        sized.append({**item, "photo_urls": photo_urls})
+    return sized
+
 # Get data given item id
 
 
 @ api.get("/get-item/{item_id}")
-async def get_item(item_id: str):
+async def get_item(item_id: str, photo_size: Optional[str] = None):
     """
     Retrieve item data by item ID.
 
+    Args:
+        photo_size (str): small, medium or large to get photo_urls at that
+            size where available (default: as stored).
+
     Returns:
         - message (str): Result message.
         - data (dict): Item information including id, seller_id, photo_urls, quality, name, description.
     """
     try:
-        response = supabase.table("items").select(
-            "*").eq("id", item_id).execute()
-        if len(response.data) == 0:
+        async def load():
+            response = await execute(supabase.table("items").select(
+                "*").eq("id", item_id))
+            return response.data
+
+        items = await cache.get_or_load(f"item:{item_id}", load)
+        if len(items) == 0:
             raise HTTPException(status_code=404, detail="Item not found")
-        return {"message": "Item retrieved successfully", "data": response.data[0]}
+        return {"message": "Item retrieved successfully", "data": _sized_photos(items, photo_size)[0]}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+ITEM_DETAIL_INCLUDES = ("seller", "bids", "bidders")
+SEARCH_INCLUDES = ("seller",)
+_column_pattern = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def _parse_include(include: Optional[str], allowed: tuple) -> set:
+    included = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = included - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(sorted(unknown))}.")
+    return included
+
+
+async def _sellers_of(items: List[dict]) -> dict:
+    """Profiles of the sellers of items, keyed by id, with each seller fetched once."""
+    seller_ids = sorted({item["seller_id"] for item in items if item.get("seller_id")})
+    if not seller_ids:
+        return {}
+
+    async def load():
+        users = await get_users_by_ids(seller_ids, columns=USER_COLUMNS)
+        return {user["id"]: user for user in users if user is not None}
+
+    return await cache.get_or_load(f"sellers:{','.join(seller_ids)}", load)
+
+
+def _item_detail_select(columns: str, include: set) -> str:
+    """PostgREST select for an item and the related rows in include."""
+    if columns.strip() == "*":
+        select = ["*"]
+    else:
+        select = [column.strip() for column in columns.split(",") if column.strip()]
+        bad = [column for column in select if not _column_pattern.match(column)]
+        if bad or not select:
+            raise ValueError(f"Invalid columns: {', '.join(bad) or columns}.")
+    if "seller" in include:
+        select.append(f"seller:users!items_seller_id_fkey({USER_COLUMNS})")
+    if "bidders" in include:
+        select.append(f"bids(*, bidder:users!bids_bidder_id_fkey({USER_COLUMNS}))")
+    elif "bids" in include:
+        select.append("bids(*)")
+    return ",".join(select)
+
+
+@ api.get("/item-detail/{item_id}")
+async def get_item_detail(item_id: str, columns: str = "*", include: str = ",".join(ITEM_DETAIL_INCLUDES), photo_size: Optional[str] = None):
+    """
+    Retrieve an item together with its seller, bids and bidders in one query.
+
+    The related rows are embedded through the items and bids foreign keys,
+    so the whole page costs a single PostgREST round trip.
+
+    Args:
+        columns (str): Comma-separated item columns to return (default: all).
+        include (str): Comma-separated related data to embed, out of seller,
+            bids and bidders (bids with each bidder's profile).
+            Default: all of them.
+        photo_size (str): small, medium or large to get photo_urls at that
+            size where available (default: as stored).
+
+    Returns:
+        A message and the item, its seller and its bids, each bid with its
+        bidder when bidders are included. Users carry only profile fields.
+    """
+    try:
+        included = _parse_include(include, ITEM_DETAIL_INCLUDES)
+        select = _item_detail_select(columns, included)
+
+        async def load():
+            response = await execute(supabase.table("items").select(select).eq("id", item_id))
+            return response.data
+
+        # Under the item's key prefix so item and bid writes invalidate it.
+        items = await cache.get_or_load(
+            f"item:{item_id}:detail:{columns}:{','.join(sorted(included))}", load)
+        if len(items) == 0:
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        item = dict(items[0])
+        seller = item.pop("seller", None)
+        bids = item.pop("bids", None)
+        if "photo_urls" in item:
+            item = _sized_photos([item], photo_size)[0]
+        return {
+            "message": "Item retrieved successfully",
+            "data": {"item": item, "seller": seller, "bids": bids},
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -455,36 +714,206 @@ async def get_item(item_id: str):
 # Returns paginated items with a similar name
 
 
+async def _search_page(name: str, page: int, page_size: int, cursor: Optional[str], ranked: bool = False, with_count: bool = False):
+    """
+    Fetch one page of a name search.
+
+    By default matches are a substring of the name, newest first, paged by
+    keyset when a cursor is given (an empty cursor means the first page) and
+    by offset otherwise. With ranked, the search_items RPC matches name, tags
+    and description with typo tolerance and orders by relevance; it only
+    pages by offset.
+
+    Returns the rows, the cursor for the following page (None once the
+    results run out, and always None for ranked search) and the total match
+    count when with_count is set.
+    """
+    # Validate page_size (max 10)
+    page_size = min(page_size, 10)
+
+    # Calculate the offset for pagination
+    offset = (page - 1) * page_size
+
+    if ranked and name:
+        if cursor is not None:
+            raise ValueError("Ranked search does not support cursors.")
+        calls = [execute(supabase.rpc("search_items", {
+            "search_query": name,
+            "page_limit": page_size,
+            "page_offset": offset,
+        }))]
+        if with_count:
+            calls.append(execute(supabase.rpc(
+                "count_search_items", {"search_query": name})))
+        responses = await asyncio.gather(*calls)
+        total_items = responses[1].data if with_count else None
+        return responses[0].data, None, total_items
+
+    def matching(columns, count=None):
+        # Adjust query based on whether the search term is empty
+        query = supabase.table("items").select(columns, count=count)
+        return query.ilike("name", f"%{name}%") if name else query
+
+    # Past the first keyset page the cursor filter would shrink the count,
+    # so the total is counted by a separate query without it.
+    separate_count = with_count and bool(cursor)
+    query = matching("*", "estimated" if with_count and not separate_count else None)
+
+    # Sort by recency using the `created_at` column, with id as a tiebreaker
+    query = query.order("created_at", desc=True).order("id", desc=True)
+
+    if cursor is not None:
+        if cursor:
+            query = after_cursor(query, cursor)
+        query = query.limit(page_size)
+    else:
+        query = query.range(offset, offset + page_size - 1)
+
+    calls = [execute(query)]
+    if separate_count:
+        calls.append(execute(matching("id", "estimated").limit(1)))
+    responses = await asyncio.gather(*calls)
+    response = responses[0]
+    next_cursor = (
+        encode_cursor(response.data[-1])
+        if len(response.data) == page_size else None
+    )
+    return response.data, next_cursor, responses[-1].count
+
+
 @ api.get("/search-items-by-name")
-async def search_items_by_name(name: str = "", page: int = 1, page_size: int = 10):
+async def search_items_by_name(name: str = "", page: int = 1, page_size: int = 10, cursor: Optional[str] = None, ranked: bool = False, photo_size: Optional[str] = None, include: Optional[str] = None):
     """
     Search for items by name with pagination, sorted by recency.
 
     Args:
         name (str): The search term.
-        page (int): The page number (default: 1).
+        page (int): The page number (default: 1). Ignored when a cursor is given.
         page_size (int): The number of items per page (default: 10, max: 10).
+        cursor (str): Keyset cursor from a previous response's next_cursor.
+            Pass an empty cursor to start from the first page.
+        ranked (bool): Search name, tags and description with typo
+            tolerance, sorted by relevance instead of recency.
+        photo_size (str): small, medium or large to get photo_urls at that
+            size where available (default: as stored).
+        include (str): "seller" to also return the sellers' profiles.
 
     Returns:
-        A message and the paginated list of items.
+        A message, the paginated list of items and the cursor for the next
+        page. With include=seller, also sellers: each seller on the page,
+        keyed by id.
     """
     try:
-        # Validate page_size (max 10)
+        included = _parse_include(include, SEARCH_INCLUDES)
+        items, next_cursor, _ = await cache.get_or_load(
+            f"search:{name}:{page}:{page_size}:{cursor}:{ranked}",
+            lambda: _search_page(name, page, page_size, cursor, ranked))
+        response = {"message": "Items retrieved successfully", "data": _sized_photos(items, photo_size), "next_cursor": next_cursor}
+        if "seller" in included:
+            response["sellers"] = await _sellers_of(items)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@ api.get("/search-items")
+async def search_items(name: str = "", page: int = 1, page_size: int = 10, cursor: Optional[str] = None, ranked: bool = False, photo_size: Optional[str] = None, include: Optional[str] = None):
+    """
+    Search for items by name and count the matches alongside the page.
+
+    Takes the same arguments as /search-items-by-name. For plain searches
+    the count comes back with the page in one round trip, and is Postgres'
+    planner estimate once the match count is large.
+
+    Returns:
+        A message and the items, next_cursor, total_count and total_pages,
+        plus sellers (keyed by id) with include=seller.
+    """
+    try:
+        included = _parse_include(include, SEARCH_INCLUDES)
+        items, next_cursor, total_items = await cache.get_or_load(
+            f"search:{name}:{page}:{page_size}:{cursor}:{ranked}:count",
+            lambda: _search_page(name, page, page_size, cursor, ranked, with_count=True))
+
         page_size = min(page_size, 10)
+        total_items = total_items or 0
+        total_pages = (total_items + page_size - 1) // page_size
 
-        # Calculate the offset for pagination
-        offset = (page - 1) * page_size
+        data = {
+            "items": _sized_photos(items, photo_size),
+            "next_cursor": next_cursor,
+            "total_count": total_items,
+            "total_pages": total_pages,
+        }
+        if "seller" in included:
+            data["sellers"] = await _sellers_of(items)
+        return {"message": "Items retrieved successfully", "data": data}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Adjust query based on whether the search term is empty
-        query = supabase.table("items").select("*")
-        if name:
-            query = query.ilike("name", f"%{name}%")
 
-        # Sort by recency using the `created_at` column
-        response = query.order("created_at", desc=True).range(
-            offset, offset + page_size - 1).execute()
+# Largest radius and k accepted by /search-items-near
+NEAR_MAX_RADIUS_METERS = 50_000
+NEAR_MAX_K = 50
+
 
-        return {"message": "Items retrieved successfully", "data": response.data}
+@ api.get("/search-items-near")
+async def search_items_near(lat: float, lng: float, radius: Optional[float] = None, k: Optional[int] = None, name: str = "", page: int = 1, page_size: int = 10, photo_size: Optional[str] = None, include: Optional[str] = None):
+    """
+    Search for items near a point, nearest first.
+
+    Args:
+        lat (float), lng (float): The point to search around.
+        radius (float): Return items within this many metres, paginated.
+        k (int): Return the k nearest items instead (max: 50). Exactly one of
+            radius and k must be given.
+        name (str): Only items whose name contains this term.
+        page (int): The page number in radius mode (default: 1).
+        page_size (int): The number of items per page in radius mode
+            (default: 10, max: 10).
+        photo_size (str): small, medium or large to get photo_urls at that
+            size where available (default: as stored).
+        include (str): "seller" to also return the sellers' profiles.
+
+    Returns:
+        A message and the items, each with its distance_meters, plus sellers
+        (keyed by id) with include=seller.
+    """
+    try:
+        included = _parse_include(include, SEARCH_INCLUDES)
+        if (radius is None) == (k is None):
+            raise ValueError("Pass either radius (in metres) or k.")
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("lat must be within [-90, 90] and lng within [-180, 180].")
+
+        if k is not None:
+            page_limit, page_offset = max(min(k, NEAR_MAX_K), 1), 0
+        else:
+            radius = min(radius, NEAR_MAX_RADIUS_METERS)
+            page_limit = min(page_size, 10)
+            page_offset = (page - 1) * page_limit
+
+        async def load():
+            response = await execute(supabase.rpc("search_items_near", {
+                "lat": lat,
+                "lng": lng,
+                "radius_meters": radius,
+                "name_query": name,
+                "page_limit": page_limit,
+                "page_offset": page_offset,
+            }))
+            return [
+                {**row["item"], "distance_meters": row["distance_meters"]}
+                for row in response.data
+            ]
+
+        # Under the search: prefix so item writes invalidate it too.
+        items = await cache.get_or_load(
+            f"search:near:{lat}:{lng}:{radius}:{name}:{page_limit}:{page_offset}", load)
+        response = {"message": "Items retrieved successfully", "data": _sized_photos(items, photo_size)}
+        if "seller" in included:
+            response["sellers"] = await _sellers_of(items)
+        return response
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -511,7 +940,7 @@ async def get_number_of_pages(name: str = "", page_size: int = 10):
         if name:
             query = query.ilike("name", f"%{name}%")
 
-        response = query.execute()
+        response = await execute(query)
 
         total_items = response.count  # Supabase includes the total count in the response
         # Calculate total number of pages
@@ -521,6 +950,75 @@ async def get_number_of_pages(name: str = "", page_size: int = 10):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@ api.get("/events")
+async def events(item_ids: Optional[str] = None, types: Optional[str] = None):
+    """
+    Stream item and bid events as server-sent events.
+
+    Args:
+        item_ids (str): Comma-separated item ids to follow. Without it, every
+            event is sent.
+        types (str): Comma-separated event types to receive, out of
+            item-created, bid-created, bid-cancelled and bid-accepted
+            (default: all).
+
+    Each event's data is the affected row as JSON. A client that falls too
+    far behind gets a final "lagged" event and should refetch and reconnect.
+    """
+    try:
+        subscription = event_broker.subscribe(
+            item_ids=[item_id.strip() for item_id in item_ids.split(",") if item_id.strip()] if item_ids else None,
+            types=[event_type.strip() for event_type in types.split(",")] if types else None)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        event_broker.stream(subscription),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@ api.post("/internal/publish-events")
+async def publish_events(data: PublishEventsInput, x_events_token: Annotated[Optional[str], Header()] = None):
+    """
+    Publish events from writers outside the API, such as the listener.
+
+    Requires the X-Events-Token header to match EVENTS_PUBLISH_TOKEN.
+    """
+    if not EVENTS_PUBLISH_TOKEN or not hmac.compare_digest(x_events_token or "", EVENTS_PUBLISH_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid events token.")
+    try:
+        unknown = {event.type for event in data.events} - set(EVENT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown event types: {', '.join(sorted(unknown))}.")
+        if any(event.type == "item-created" for event in data.events):
+            await cache.invalidate_prefix("search:")
+        for event in data.events:
+            event_broker.publish(event.type, event.data, event.item_id)
+        return {"message": "Events published successfully", "data": len(data.events)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@ api.get("/events-stats")
+async def events_stats():
+    """
+    Report subscriber and event counters for the event broker of this worker.
+    """
+    return {"message": "Event stats retrieved successfully", "data": event_broker.stats()}
+
+
+@ api.get("/cache-stats")
+async def cache_stats():
+    """
+    Report hit/miss counters for the response cache of this worker.
+    """
+    return {"message": "Cache stats retrieved successfully", "data": cache.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(api, host="0.0.0.0", port=8000)
@@ -0,0 +1,113 @@
+"""
+Async data access for the API handlers.
+
+supabase-py's client is synchronous: every ``.execute()`` blocks for a full
+PostgREST round trip. Handlers build their queries as usual and hand them to
+``execute`` here, which runs them on a bounded worker pool so the event loop
+stays free. All queries share one client, and therefore one pooled httpx
+connection to PostgREST.
+"""
+import asyncio
+import base64
+import json
+import os
+from functools import partial
+from typing import List, Optional, Tuple
+
+import anyio
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from backend.listener.keyset import after_key
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+# Upper bound on queries in flight at once; keeps a burst of requests from
+# opening more PostgREST connections than the pool is meant to hold.
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "20"))
+
+_limiter = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    # CapacityLimiter has to be created inside a running event loop.
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(DB_MAX_CONCURRENCY)
+    return _limiter
+
+
+async def run(fn, *args, **kwargs):
+    """Call a blocking Supabase function (storage, rpc, ...) off the event loop."""
+    return await anyio.to_thread.run_sync(
+        partial(fn, *args, **kwargs), limiter=_get_limiter())
+
+
+async def execute(query):
+    """Execute a PostgREST query builder off the event loop."""
+    return await run(query.execute)
+
+
+# Profile fields returned for users embedded in other responses. Leaves
+# out private columns such as phone.
+USER_COLUMNS = "id, name, email, pfp_url, karma"
+
+# in_() filters travel in the query string. A uuid is 36 characters, so 100
+# ids per request keeps each URL around 4 KB, inside PostgREST/proxy limits.
+USER_LOOKUP_CHUNK_SIZE = 100
+MAX_USER_LOOKUP_IDS = 1000
+
+
+async def get_users_by_ids(user_ids: List[str], columns: str = "*") -> List[Optional[dict]]:
+    """
+    Fetch several users with one in_() query per chunk of ids.
+
+    Duplicate ids are only queried once. The result lines up with
+    ``user_ids``, with None wherever a user does not exist.
+    """
+    unique_ids = list(dict.fromkeys(user_ids))
+    if len(unique_ids) > MAX_USER_LOOKUP_IDS:
+        raise ValueError(
+            f"Cannot look up more than {MAX_USER_LOOKUP_IDS} users at once.")
+
+    chunks = [
+        unique_ids[i:i + USER_LOOKUP_CHUNK_SIZE]
+        for i in range(0, len(unique_ids), USER_LOOKUP_CHUNK_SIZE)
+    ]
+    responses = await asyncio.gather(*(
+        execute(supabase.table("users").select(columns).in_("id", chunk))
+        for chunk in chunks
+    ))
+
+    users_by_id = {
+        row["id"]: row for response in responses for row in response.data}
+    return [users_by_id.get(user_id) for user_id in user_ids]
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque keyset cursor pointing just past ``row`` in (created_at, id) order."""
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    return created_at, row_id
+
+
+def after_cursor(query, cursor: str, desc: bool = True):
+    """
+    Restrict a query ordered by (created_at, id) to rows after ``cursor``.
+
+    Unlike range(), this lets Postgres seek straight to the cursor through
+    the (created_at, id) index, so deep pages cost the same as the first.
+    """
+    created_at, row_id = decode_cursor(cursor)
+    return after_key(query, created_at, row_id, desc)
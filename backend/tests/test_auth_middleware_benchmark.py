@@ -0,0 +1,117 @@
+"""
+Per-request cost of AuthMiddleware against the BaseHTTPMiddleware version it
+replaced, with no token, a new token on every request and a repeated one.
+
+Both wrap the same bare ASGI endpoint and are called directly, so the numbers
+are the middleware alone. Run with -s to see them:
+
+    python -m pytest -s backend/tests/test_auth_middleware_benchmark.py
+"""
+import asyncio
+import time
+
+import pytest
+
+jwt = pytest.importorskip("jwt")
+pytest.importorskip("fastapi")
+
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from backend import auth_middleware
+from backend.auth_middleware import AuthMiddleware
+
+SECRET = "benchmark-secret-at-least-32-bytes-long"
+REQUESTS = 2000
+
+# Both versions pass do_verify, which PyJWT 2 warns about on every decode.
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+def old_verify_access_token(request):
+    """verify_access_token before the token cache: decodes on every request."""
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    access_token = authorization.split(" ")[1]
+    if access_token:
+        try:
+            return jwt.decode(access_token, key=SECRET, do_verify=True,
+                              algorithms=["HS256"], audience="authenticated")["user_metadata"]
+        except:
+            return None
+    return None
+
+
+class OldAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        try:
+            request.state.user = old_verify_access_token(request)
+            return await call_next(request)
+        except Exception as e:
+            return JSONResponse(content={"detail": f"Error: {str(e)}"}, status_code=500)
+
+
+async def endpoint(scope, receive, send):
+    assert scope["state"]["user"] in (None, {"name": "Ada"})
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def make_token(number: int) -> str:
+    return jwt.encode({
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+        "jti": str(number),
+        "user_metadata": {"name": "Ada"},
+    }, SECRET, algorithm="HS256")
+
+
+def microseconds_per_request(middleware, tokens) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def burst():
+        start = time.perf_counter()
+        for token in tokens:
+            headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+            scope = {"type": "http", "method": "GET", "path": "/api/get-items", "raw_path": b"/api/get-items",
+                     "query_string": b"", "headers": headers, "state": {}}
+            await middleware(scope, receive, send)
+        return time.perf_counter() - start
+
+    return asyncio.run(burst()) / len(tokens) * 1e6
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(auth_middleware, "SUPABASE_JWT_SECRET", SECRET)
+    auth_middleware._token_cache.clear()
+    yield
+    auth_middleware._token_cache.clear()
+
+
+def test_auth_middleware_per_request_cost():
+    old, new = OldAuthMiddleware(endpoint), AuthMiddleware(endpoint)
+    repeated = [make_token(0)] * REQUESTS
+    cases = {
+        "no token": [None] * REQUESTS,
+        "new token each request": [make_token(number) for number in range(1, REQUESTS + 1)],
+        "same token": repeated,
+    }
+    results = {name: (microseconds_per_request(old, tokens), microseconds_per_request(new, tokens))
+               for name, tokens in cases.items()}
+
+    print(f"\n{REQUESTS} requests, microseconds per request (BaseHTTPMiddleware -> ASGI):")
+    for name, (before, after) in results.items():
+        print(f"  {name:<24} {before:8.1f} -> {after:8.1f}")
+
+    # Dropping BaseHTTPMiddleware's task and stream plumbing helps every request.
+    for before, after in results.values():
+        assert after < before
+    # A repeated token skips verification, so it costs about what no token does.
+    assert results["same token"][1] < results["new token each request"][1]
+    assert len(auth_middleware._token_cache) == REQUESTS + 1
@@ -0,0 +1,98 @@
+"""BatchWriter against a stand-in for the supabase client's upsert chain."""
+import json
+
+import pytest
+
+from batch_writer import BatchWriter, is_permanent
+
+
+class APIError(Exception):
+    """Shaped like postgrest's APIError: the SQLSTATE or PGRST code is on .code."""
+
+    def __init__(self, code):
+        super().__init__(f"error {code}")
+        self.code = code
+
+
+class FakeClient:
+    """Fails any upsert containing a row named in ``bad`` with ``error``."""
+
+    def __init__(self, bad=(), error=None):
+        self.bad = set(bad)
+        self.error = error
+        self.calls = []
+        self.stored = []
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict, ignore_duplicates):
+        self.calls.append([row["name"] for row in rows])
+        self.pending = rows
+        return self
+
+    def execute(self):
+        if any(row["name"] in self.bad for row in self.pending):
+            raise self.error
+        self.stored += self.pending
+        return type("Response", (), {"data": list(self.pending)})()
+
+
+def rows(*names):
+    return [{"name": name, "created_at": "2024-09-01T12:00:00+00:00"} for name in names]
+
+
+@pytest.mark.parametrize("code, permanent", [
+    ("23505", True),
+    ("22007", True),
+    ("42703", True),
+    ("PGRST204", True),
+    ("PGRST000", False),
+    ("57014", False),
+    ("40001", False),
+    (None, False),
+])
+def test_is_permanent(code, permanent):
+    assert is_permanent(APIError(code)) is permanent
+
+
+def test_full_batches_are_written_in_one_request():
+    client = FakeClient()
+    written = []
+    writer = BatchWriter(client, "items", "name,created_at", max_rows=3,
+                         on_written=lambda rows, inserted: written.append(len(inserted)))
+    for row in rows("a", "b", "c", "d"):
+        writer.add(row)
+    writer.close()
+    assert client.calls == [["a", "b", "c"], ["d"]]
+    assert written == [3, 1]
+    assert writer.written == 4
+
+
+def test_rejected_row_is_isolated_and_recorded(tmp_path):
+    rejected_path = tmp_path / "rejected.jsonl"
+    client = FakeClient(bad={"c"}, error=APIError("22007"))
+    writer = BatchWriter(client, "items", "name,created_at", max_rows=8, rejected_path=str(rejected_path))
+    for row in rows(*"abcdefgh"):
+        writer.add(row)
+    writer.close()
+
+    assert sorted(row["name"] for row in client.stored) == list("abdefgh")
+    assert writer.errors == []
+    assert [row["name"] for row, _ in writer.rejected] == ["c"]
+    recorded = [json.loads(line) for line in rejected_path.read_text().splitlines()]
+    assert [entry["row"]["name"] for entry in recorded] == ["c"]
+
+
+def test_transient_failure_is_not_split_or_rejected(tmp_path):
+    client = FakeClient(bad={"c"}, error=ConnectionError("connection reset"))
+    writer = BatchWriter(client, "items", "name,created_at", max_rows=4,
+                         rejected_path=str(tmp_path / "rejected.jsonl"))
+    for row in rows("a", "b", "c", "d"):
+        writer.add(row)
+    writer.close()
+
+    assert client.calls == [["a", "b", "c", "d"]]
+    assert [row["name"] for row, _ in writer.errors] == ["a", "b", "c", "d"]
+    assert writer.rejected == []
+    assert not (tmp_path / "rejected.jsonl").exists()
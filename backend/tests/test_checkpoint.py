@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+import checkpoint
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_path(tmp_path, monkeypatch):
+    path = tmp_path / "checkpoints.json"
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_PATH", str(path))
+    monkeypatch.setattr(checkpoint, "CACHE_DIR", str(tmp_path))
+    return path
+
+
+def test_save_and_load_round_trip():
+    assert checkpoint.load("reuse") == {}
+    checkpoint.save("reuse", (2024, 9), 12345, '"abc"')
+    checkpoint.save("free-foods", (2024, 10), 0, None)
+    assert checkpoint.load("reuse") == {"month": "2024-09", "offset": 12345, "etag": '"abc"'}
+    assert checkpoint.load("free-foods")["month"] == "2024-10"
+
+
+def test_archive_name_is_locale_independent():
+    assert checkpoint.archive_name((2024, 9)) == "2024-September.txt"
+    assert checkpoint.archive_name((2025, 1)) == "2025-January.txt"
+
+
+def test_new_list_polls_only_the_current_month():
+    assert checkpoint.months_to_poll({}, today=date(2024, 9, 15)) == [(2024, 9)]
+
+
+def test_polls_from_the_checkpointed_month_across_a_year_end():
+    state = {"month": "2024-11", "offset": 10, "etag": None}
+    assert checkpoint.months_to_poll(state, today=date(2025, 2, 1)) == [
+        (2024, 11), (2024, 12), (2025, 1), (2025, 2)]
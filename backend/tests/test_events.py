@@ -0,0 +1,112 @@
+"""EventBroker fan-out, filtering and lag handling with many subscribers."""
+import asyncio
+import time
+
+import pytest
+
+from backend.events import EventBroker
+
+SUBSCRIBERS = 5000
+
+
+async def read_events(broker, subscription, count):
+    """Collect ``count`` encoded events from a subscription's stream."""
+    events = []
+    stream = broker.stream(subscription)
+    async for message in stream:
+        if message.startswith("id: "):
+            events.append(message)
+            if len(events) == count:
+                break
+    await stream.aclose()
+    return events
+
+
+def test_fan_out_to_thousands_of_streams():
+    broker = EventBroker(queue_size=50, heartbeat=60, max_subscribers=SUBSCRIBERS)
+
+    async def scenario():
+        subscriptions = [broker.subscribe() for _ in range(SUBSCRIBERS)]
+        readers = [asyncio.ensure_future(read_events(broker, subscription, 20))
+                   for subscription in subscriptions]
+        await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        for number in range(20):
+            broker.publish("item-created", {"id": str(number)}, item_id=str(number))
+        publish_seconds = time.perf_counter() - start
+
+        received = await asyncio.wait_for(asyncio.gather(*readers), 30)
+        return publish_seconds, received
+
+    publish_seconds, received = asyncio.run(scenario())
+    assert all(len(events) == 20 for events in received)
+    assert all(events[0].startswith("id: 1\nevent: item-created\n") for events in received)
+    # 100,000 deliveries; publishing only queues them.
+    assert publish_seconds < 5
+    # Every stream unsubscribed itself when it closed.
+    assert broker.stats()["subscribers"] == 0
+    assert broker.stats()["dropped"] == 0
+
+
+def test_item_subscribers_only_see_their_items():
+    broker = EventBroker(queue_size=10)
+
+    async def scenario():
+        followers = [broker.subscribe(item_ids=[f"item-{number % 100}"]) for number in range(1000)]
+        bids_only = broker.subscribe(types=["bid-created"])
+        broker.publish("bid-created", {"id": "bid"}, item_id="item-7")
+        broker.publish("item-created", {"id": "item-500"}, item_id="item-500")
+        return followers, bids_only
+
+    followers, bids_only = asyncio.run(scenario())
+    assert [subscription.queue.qsize() for subscription in followers].count(1) == 10
+    assert all(subscription.queue.qsize() == 0 for subscription in followers
+               if subscription.item_ids != frozenset({"item-7"}))
+    assert bids_only.queue.qsize() == 1
+    assert broker.stats()["followed_items"] == 100
+
+
+def test_slow_subscribers_are_dropped_with_a_lagged_event():
+    broker = EventBroker(queue_size=5, heartbeat=60)
+
+    async def scenario():
+        slow = [broker.subscribe() for _ in range(1000)]
+        for number in range(6):
+            broker.publish("item-created", {"id": str(number)})
+        stats = broker.stats()
+        messages = [message async for message in broker.stream(slow[0])]
+        return stats, messages
+
+    stats, messages = asyncio.run(scenario())
+    assert stats["subscribers"] == 0
+    assert stats["dropped"] == 1000
+    # What was queued before the drop is still delivered, then "lagged" ends the stream.
+    assert messages[0] == "retry: 3000\n\n"
+    assert sum(message.startswith("id: ") for message in messages) == 5
+    assert messages[-1] == "event: lagged\ndata: {}\n\n"
+
+
+def test_idle_stream_sends_heartbeats():
+    broker = EventBroker(heartbeat=0.01)
+
+    async def scenario():
+        stream = broker.stream(broker.subscribe())
+        messages = [await stream.__anext__() for _ in range(3)]
+        await stream.aclose()
+        return messages
+
+    assert asyncio.run(scenario()) == ["retry: 3000\n\n", ": heartbeat\n\n", ": heartbeat\n\n"]
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_subscriber_cap_and_unknown_types():
+    broker = EventBroker(max_subscribers=2)
+    broker.subscribe()
+    broker.subscribe()
+    with pytest.raises(RuntimeError):
+        broker.subscribe()
+    with pytest.raises(ValueError):
+        EventBroker().subscribe(types=["item-deleted"])
+    with pytest.raises(ValueError):
+        broker.publish("item-deleted", {})
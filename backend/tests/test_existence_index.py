@@ -0,0 +1,83 @@
+"""ExistenceIndex loading against a stand-in for the supabase client's query chain."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+import utils
+
+START = datetime(2024, 9, 1, tzinfo=timezone.utc)
+# Three items per timestamp, so pages end in the middle of a tie.
+ROWS = [
+    {"id": f"{number:05d}", "name": f"Item {number}",
+     "created_at": (START + timedelta(hours=number // 3)).isoformat()}
+    for number in range(100)
+]
+
+
+class FakeQuery:
+    """Applies the filters ExistenceIndex uses to ROWS and counts the requests."""
+
+    requests = 0
+
+    def __init__(self):
+        self.filters = []
+        self.rows = None
+
+    def table(self, name):
+        return FakeQuery()
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def or_(self, condition):
+        created_at, row_id = condition.split('"')[1], condition.split('"')[5]
+        self.filters.append(lambda row: (row["created_at"], row["id"]) > (created_at, row_id))
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, rows):
+        self.rows = rows
+        return self
+
+    def range(self, start, end):
+        raise AssertionError("ExistenceIndex should page by keyset, not offset")
+
+    def execute(self):
+        FakeQuery.requests += 1
+        rows = sorted((row for row in ROWS if all(check(row) for check in self.filters)),
+                      key=lambda row: (row["created_at"], row["id"]))
+        return type("Response", (), {"data": rows[:self.rows]})()
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(utils, "supabase", FakeQuery())
+    monkeypatch.setattr(utils.ExistenceIndex, "PAGE_SIZE", 7)
+    FakeQuery.requests = 0
+    return utils.ExistenceIndex()
+
+
+def test_load_pages_through_ties_without_skipping_or_repeating(index):
+    index._load(START, START + timedelta(days=30))
+    loaded = sorted(name for name, dates in index.dates_by_name.items() for _ in dates)
+    assert loaded == sorted(row["name"] for row in ROWS)
+    assert FakeQuery.requests == len(ROWS) // 7 + 1
+
+
+def test_load_stays_within_the_span(index):
+    index._load(START + timedelta(hours=10), START + timedelta(hours=20))
+    assert sum(len(dates) for dates in index.dates_by_name.values()) == 30
+    assert index.find(START + timedelta(hours=15), "Item 45") == START + timedelta(hours=15)
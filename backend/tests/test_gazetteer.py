@@ -0,0 +1,57 @@
+"""Offline campus lookups; none of these may need a geocoding request."""
+import pytest
+
+import gazetteer
+from gazetteer import BUILDINGS, PLACES, lookup
+
+
+@pytest.mark.parametrize("address, building", [
+    ("Building 32", "32"),
+    ("bldg. E14, 3rd floor lounge", "e14"),
+    ("Bldg #10", "10"),
+    ("NW86", "nw86"),
+    ("32", "32"),
+    ("Stata Center, MIT", "32"),
+    ("ray and maria stata center", "32"),
+    ("Lobby 7", "7"),
+    ("77 Mass Ave", "7"),
+    ("outside the Student Center", "w20"),
+    ("Walker Memorial", "50"),
+    ("MIT.nano loading dock", "12"),
+    ("Burton-Conner", "w51"),
+    ("Sidney Pacific front desk", "nw86"),
+])
+def test_known_places(address, building):
+    assert lookup(address) == BUILDINGS[building]
+
+
+def test_places_without_a_building_number():
+    assert lookup("Killian Court") == PLACES["killian court"]
+    assert lookup("near Kendall Square T stop") == PLACES["kendall square"]
+
+
+@pytest.mark.parametrize("address", [
+    "",
+    None,
+    "Harvard Square",
+    "Building 99",
+    "123 Main St, Somerville",
+    "studio apartment in Allston",
+])
+def test_unknown_places(address):
+    assert lookup(address) is None
+
+
+def test_normalize_drops_mit_and_punctuation():
+    assert gazetteer.normalize("  Baker House, MIT. ") == "baker house"
+    assert gazetteer.normalize("Stata near MIT") == "stata"
+    assert gazetteer.normalize("MIT.nano") == "mit.nano"
+
+
+def test_every_named_place_points_at_a_known_building():
+    for name, place in PLACES.items():
+        if isinstance(place, str):
+            assert place in BUILDINGS, name
+        else:
+            latitude, longitude = place
+            assert 42.3 < latitude < 42.4 and -71.2 < longitude < -71.0, name
@@ -0,0 +1,38 @@
+"""Transcoding, in this process and in the worker pool."""
+import io
+import os
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import images
+
+
+def photo(width=1600, height=1200) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_transcode_makes_every_variant_largest_first():
+    encoded, image_hash = images.transcode(photo(), image_format="jpeg")
+    assert list(encoded) == [name for name, _ in images.IMAGE_VARIANTS]
+    for (name, size), data in zip(images.IMAGE_VARIANTS, encoded.values()):
+        assert max(Image.open(io.BytesIO(data)).size) == size
+    assert 0 <= image_hash < 2 ** 64
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_started_pool_forks_every_worker_up_front(monkeypatch):
+    monkeypatch.setattr(images, "_pool", None)
+    images.start_pool()
+    pool = images._pool
+    try:
+        assert len(pool._processes) == images.IMAGE_PROCESSES
+        encoded, _ = images.transcode_in_pool(photo())
+        assert set(encoded) == {name for name, _ in images.IMAGE_VARIANTS}
+        # Transcoding reuses the same workers rather than starting more.
+        assert len(pool._processes) == images.IMAGE_PROCESSES
+    finally:
+        pool.shutdown()
@@ -0,0 +1,122 @@
+"""
+Item page load time with one /item-detail call against the four requests
+SingleItem.tsx used to make one after another: get-item, get-user for the
+seller, get-bids-for-item and get-multiple-users for the bidders.
+
+Each HTTP request waits CLIENT_LATENCY (browser to API) and each query
+DB_LATENCY (API to PostgREST), on top of the real app's routing. Run with -s
+to see the numbers:
+
+    python -m pytest -s backend/tests/test_item_detail_benchmark.py
+"""
+import asyncio
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+from backend import main, repository
+from backend.cache import cache
+
+CLIENT_LATENCY = 0.02
+DB_LATENCY = 0.01
+PAGE_LOADS = 10
+
+USERS = {f"user-{number}": {"id": f"user-{number}", "name": f"User {number}"} for number in range(6)}
+ITEM = {"id": "item-1", "name": "Desk lamp", "seller_id": "user-0", "photo_urls": []}
+BIDS = [{"id": f"bid-{number}", "item_id": "item-1", "bidder_id": f"user-{number}", "accepted": False}
+        for number in range(1, 6)]
+
+
+class FakeQuery:
+    """Answers the selects the item page makes, embeds included."""
+
+    def __init__(self, table):
+        self.table = table
+        self.filters = {}
+
+    def select(self, columns, count=None):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = [value]
+        return self
+
+    def in_(self, column, values):
+        self.filters[column] = list(values)
+        return self
+
+    def rows(self):
+        if self.table == "users":
+            return [USERS[user_id] for user_id in self.filters["id"] if user_id in USERS]
+        if self.table == "bids":
+            return [bid for bid in BIDS if bid["item_id"] in self.filters["item_id"]]
+        item = dict(ITEM)
+        if "seller:" in self.columns:
+            item["seller"] = USERS[item["seller_id"]]
+        if "bidder:" in self.columns:
+            item["bids"] = [dict(bid, bidder=USERS[bid["bidder_id"]]) for bid in BIDS]
+        return [item]
+
+
+@pytest.fixture(autouse=True)
+def slow_database(monkeypatch):
+    async def execute(query):
+        await asyncio.sleep(DB_LATENCY)
+        return type("Response", (), {"data": query.rows()})()
+
+    monkeypatch.setattr(main.supabase, "table", FakeQuery)
+    monkeypatch.setattr(main, "execute", execute)
+    monkeypatch.setattr(repository, "execute", execute)
+
+
+async def get(client, path):
+    await asyncio.sleep(CLIENT_LATENCY)
+    response = await client.get(path)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+async def four_requests(client):
+    item = await get(client, "/api/get-item/item-1")
+    seller = await get(client, f"/api/get-user/{item['seller_id']}")
+    bids = await get(client, f"/api/get-bids-for-item/{item['id']}")
+    bidders = await get(client, "/api/get-multiple-users?userids="
+                        + ",".join(bid["bidder_id"] for bid in bids))
+    return item, seller, bids, bidders
+
+
+async def one_request(client):
+    detail = await get(client, "/api/item-detail/item-1")
+    return detail["item"], detail["seller"], detail["bids"], [bid["bidder"] for bid in detail["bids"]]
+
+
+def seconds_per_page(load_page):
+    async def page_loads():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            for _ in range(PAGE_LOADS):
+                # Every load misses the response cache, as a first visit would.
+                await cache.invalidate_prefix("item:", "user:", "bids:")
+                page = await load_page(client)
+            return (time.perf_counter() - start) / PAGE_LOADS, page
+
+    return asyncio.run(page_loads())
+
+
+def test_item_detail_cuts_page_load_time():
+    before, old_page = seconds_per_page(four_requests)
+    after, new_page = seconds_per_page(one_request)
+    print(f"\nitem page, {CLIENT_LATENCY * 1000:.0f} ms per request and {DB_LATENCY * 1000:.0f} ms per query: "
+          f"{before * 1000:.0f} ms with four requests, {after * 1000:.0f} ms with item-detail")
+
+    # Both return the same page.
+    item, seller, bids, bidders = new_page
+    assert (item, seller, bidders) == (old_page[0], old_page[1], old_page[3])
+    assert [dict(bid, bidder=None) for bid in bids] == [dict(bid, bidder=None) for bid in old_page[2]]
+    # Four client and four database round trips against one of each.
+    assert after * 2.5 < before
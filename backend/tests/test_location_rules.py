@@ -0,0 +1,110 @@
+"""
+Location rules against a labelled set of list-style emails.
+
+Each fixture email has the location and self-pickup a reader would give it;
+``location`` is null when the email names no single campus place, so the
+rules should leave it to the model. Run this file directly for the report:
+
+    python backend/tests/test_location_rules.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "location_emails.jsonl")
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "listener"))
+
+import location_rules
+from location_rules import RULES_MIN_CONFIDENCE, extract_can_self_pickup, extract_location
+
+
+def load_emails():
+    with open(FIXTURE_PATH) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(emails):
+    """Score the rules the way get_location_and_can_self_pickup uses them."""
+    report = {"emails": len(emails), "resolved": 0, "correct": 0, "wrong": []}
+    for email in emails:
+        text = email["subject"] + "\n" + email["body"]
+        location, location_confidence = extract_location(text)
+        can_self_pickup, pickup_confidence = extract_can_self_pickup(text)
+        if min(location_confidence, pickup_confidence) < RULES_MIN_CONFIDENCE:
+            continue
+        report["resolved"] += 1
+        if (location, can_self_pickup) == (email["location"], email["can_self_pickup"]):
+            report["correct"] += 1
+        else:
+            report["wrong"].append((email["subject"], location, can_self_pickup))
+    return report
+
+
+def format_report(report) -> str:
+    resolved = report["resolved"]
+    lines = [
+        f"{report['emails']} emails, {resolved} resolved by rules "
+        f"({resolved / report['emails']:.0%} of model calls avoided)",
+        f"accuracy on resolved emails: {report['correct']}/{resolved}"
+        f" ({report['correct'] / resolved if resolved else 0:.0%})",
+    ]
+    lines += [f"  wrong: {subject!r} -> {location!r}, self-pickup {pickup}"
+              for subject, location, pickup in report["wrong"]]
+    return "\n".join(lines)
+
+
+def test_rules_are_right_whenever_they_skip_the_model():
+    report = evaluate(load_emails())
+    print(format_report(report))
+    assert report["wrong"] == []
+    assert report["resolved"] / report["emails"] >= 0.6
+
+
+@pytest.mark.parametrize("text", [
+    "asking $10-200 each, email me",
+    "Metal shelving, 10-200 lb capacity per shelf.",
+    "Chem kits for 10-200 students, unopened.",
+    "text me at 617-253-1000",
+    "available 9-5 weekdays",
+])
+def test_ranges_and_numbers_are_not_rooms(text):
+    assert extract_location(text) == (None, 0.0)
+
+
+@pytest.mark.parametrize("text, location", [
+    ("outside my office, 32-123", "Building 32, room 123"),
+    ("Pick up in 10-250 after lecture", "Building 10, room 250"),
+    ("It's in E25-117", "Building E25, room 117"),
+    ("my desk is 32-G882", "Building 32, room G882"),
+    ("Building 16, room 134", "Building 16, room 134"),
+])
+def test_room_numbers(text, location):
+    assert extract_location(text) == (location, 0.9)
+
+
+@pytest.mark.parametrize("text", [
+    "Free baby walker in Somerville, pick up at 12 Elm St.",
+    "Free stud finder, I'm in Central Square most evenings.",
+])
+def test_nicknames_without_a_cue_defer_to_the_model(text):
+    location, confidence = extract_location(text)
+    assert confidence < RULES_MIN_CONFIDENCE
+
+
+def test_two_places_defer_to_the_model():
+    location, confidence = extract_location("I'm in 26-152 or 32-G882 most days")
+    assert confidence < RULES_MIN_CONFIDENCE
+
+
+def test_address_from_location():
+    assert location_rules.address_from_location("Building E14, room 240") == "MIT building E14"
+    assert location_rules.address_from_location("Baker House") == "Baker House near MIT"
+    assert location_rules.address_from_location("somewhere in Allston") is None
+
+
+if __name__ == "__main__":
+    print(format_report(evaluate(load_emails())))
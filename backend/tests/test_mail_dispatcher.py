@@ -0,0 +1,101 @@
+"""MailDispatcher against a local aiosmtpd server standing in for the SMTP relay."""
+import asyncio
+import smtplib
+import socket
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+from backend.mailer.dispatcher import MailDispatcher, SMTPSession
+
+
+class LocalSession(SMTPSession):
+    """Plain SMTP with no STARTTLS or login, which the stand-in doesn't offer."""
+
+    def connect(self):
+        self.server = smtplib.SMTP(self.host, self.port, timeout=5)
+
+
+class RecordingHandler:
+    """Accepts every message, or rejects the first ``reject_first`` with a 451."""
+
+    def __init__(self, reject_first=0):
+        self.reject_first = reject_first
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reject_first:
+            self.reject_first -= 1
+            return "451 Try again later"
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+
+    def start(handler):
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        servers.append(controller)
+        return LocalSession(controller.hostname, controller.port,
+                            "reuse@example.com", None, use_tls=False)
+
+    yield start
+    for controller in servers:
+        controller.stop()
+
+
+def test_batch_goes_out_over_one_connection(smtp_server):
+    handler = RecordingHandler()
+    dispatcher = MailDispatcher(smtp_server(handler))
+
+    async def scenario():
+        for i in range(5):
+            dispatcher.enqueue(f"bidder{i}@example.com", "Your bid was accepted", "Hello")
+        await dispatcher.stop(timeout=5)
+
+    asyncio.run(scenario())
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == [
+        f"bidder{i}@example.com" for i in range(5)]
+    assert len(handler.sessions) == 1
+    assert dispatcher.sent == 5
+
+
+def test_stop_waits_for_pending_retries(smtp_server):
+    handler = RecordingHandler(reject_first=1)
+    dispatcher = MailDispatcher(smtp_server(handler), retry_base=0.2)
+
+    async def scenario():
+        dispatcher.enqueue("bidder@example.com", "Your bid was accepted", "Hello")
+        await dispatcher.stop(timeout=5)
+
+    asyncio.run(scenario())
+    assert [envelope.rcpt_tos for envelope in handler.messages] == [["bidder@example.com"]]
+    assert dispatcher.failed == 0
+    assert not dispatcher.retries
+
+
+def test_gives_up_after_max_attempts(smtp_server):
+    handler = RecordingHandler(reject_first=10)
+    dispatcher = MailDispatcher(smtp_server(handler), max_attempts=3, retry_base=0.01)
+
+    async def scenario():
+        dispatcher.enqueue("bidder@example.com", "Your bid was accepted", "Hello")
+        await dispatcher.stop(timeout=5)
+
+    asyncio.run(scenario())
+    assert handler.messages == []
+    assert handler.reject_first == 7
+    assert dispatcher.failed == 1
@@ -0,0 +1,87 @@
+import gzip
+
+import pytest
+
+from mbox import MboxStream, iter_messages
+
+ARCHIVE = (
+    "From alice at mit.edu  Sun Sep  1 08:22:39 2024\n"
+    "From: alice at mit.edu (Alice)\n"
+    "Date: Sun, 1 Sep 2024 08:22:39 -0400\n"
+    "Subject: [Reuse] Desk lamp\n"
+    "\n"
+    "Desk lamp outside 32-123, café corner.\n"
+    "\n"
+    "From bob at mit.edu  Mon Sep  2 10:00:00 2024\n"
+    "From: bob at mit.edu (Bob)\n"
+    "Date: Mon, 2 Sep 2024 10:00:00 -0400\n"
+    "Subject: [Reuse] Chairs\n"
+    "\n"
+    "Two chairs in E14-240.\n"
+    "\n"
+    "From carol at mit.edu  Tue Sep  3 12:30:00 2024\n"
+    "From: carol at mit.edu (Carol)\n"
+    "Date: Tue, 3 Sep 2024 12:30:00 -0400\n"
+    "Subject: [Reuse] Snacks\n"
+    "\n"
+    "Snacks in the Student Center.\n"
+).encode()
+
+# Byte offsets of each message's From: line, counted in the uncompressed archive.
+MESSAGE_OFFSETS = [ARCHIVE.index(f"From: {name}".encode()) for name in ("alice", "bob", "carol")]
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 64, 4096])
+@pytest.mark.parametrize("compress", [False, True])
+def test_offsets_survive_any_chunking(chunk_size, compress):
+    data = gzip.compress(ARCHIVE) if compress else ARCHIVE
+    stream = MboxStream(chunked(data, chunk_size))
+    messages = list(stream.messages())
+
+    assert [offset for offset, _ in messages] == MESSAGE_OFFSETS
+    assert messages[1][1].startswith("From: bob at mit.edu (Bob)")
+    assert "café corner" in messages[0][1]
+    assert stream.end_offset == len(ARCHIVE)
+    assert stream.complete
+
+
+def test_start_offset_skips_processed_messages():
+    stream = MboxStream(chunked(gzip.compress(ARCHIVE), 5))
+    assert [offset for offset, _ in stream.messages(MESSAGE_OFFSETS[1])] == MESSAGE_OFFSETS[1:]
+
+
+def test_ranged_download_keeps_absolute_offsets():
+    # A 206 response carries only the bytes from the checkpoint on.
+    start = MESSAGE_OFFSETS[1]
+    stream = MboxStream(chunked(ARCHIVE[start:], 11), base_offset=start)
+    assert [offset for offset, _ in stream.messages(start)] == MESSAGE_OFFSETS[1:]
+    assert stream.end_offset == len(ARCHIVE)
+
+
+def test_truncated_gzip_is_not_complete():
+    data = gzip.compress(ARCHIVE)
+    stream = MboxStream(chunked(data[:len(data) - 20], 7))
+    list(stream.messages())
+    assert not stream.complete
+
+
+def test_unread_stream_is_not_complete():
+    stream = MboxStream(chunked(ARCHIVE, 8))
+    messages = stream.messages()
+    next(messages)
+    assert not stream.complete
+
+
+def test_digests_are_skipped():
+    lines = [
+        "From: alice at mit.edu (Alice)", "Subject: [Reuse] Lamp", "", "Lamp.",
+        "From: Reuse at mit.edu digest", "lots of messages",
+        "End of Reuse Digest, Vol 1, Issue 2",
+        "From: bob at mit.edu (Bob)", "Subject: [Reuse] Chair", "", "Chair.",
+    ]
+    messages = list(iter_messages(enumerate(lines)))
+    assert [offset for offset, _ in messages] == [0, 7]
@@ -0,0 +1,43 @@
+"""parse_email on list posts and on what's left between them."""
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+import utils
+from utils import parse_email
+
+POST = """From: dana at mit.edu (Dana Lee)
+Date: Sun, 1 Sep 2024 08:22:39 -0400
+Subject: [Reuse] Free monitor stand
+Message-ID: <1@mit.edu>
+
+Outside my office, 32-123. Help yourself!
+"""
+
+
+@pytest.fixture(autouse=True)
+def nothing_stored(monkeypatch):
+    monkeypatch.setattr(utils, "check_existence", lambda date, subject: False)
+
+
+def test_post():
+    email = parse_email(POST, "Reuse")
+    assert (email.subject, email.from_, email.name) == ("Free monitor stand", "dana@mit.edu", "Dana Lee")
+    assert email.date == "Sun, 1 Sep 2024 08:22:39 -0400"
+    assert email.body == "Outside my office, 32-123. Help yourself!"
+
+
+@pytest.mark.parametrize("text", [
+    "_______________________________________________\nReuse mailing list\nReuse at mit.edu",
+    "Subject: [Reuse] Free monitor stand\n\nNo sender or date.",
+    "From: dana at mit.edu (Dana Lee)\nSubject: [Reuse] Free monitor stand\n\nNo date.",
+    "",
+])
+def test_messages_missing_headers_are_skipped(text):
+    assert parse_email(text, "Reuse") is None
+
+
+def test_stored_posts_are_skipped(monkeypatch):
+    monkeypatch.setattr(utils, "check_existence", lambda date, subject: True)
+    assert parse_email(POST, "Reuse") is None
@@ -0,0 +1,146 @@
+"""run_pipeline with stand-in services that only add latency."""
+import json
+import threading
+import time
+
+import pytest
+
+from pipeline import PermanentError, Stage, best_so_far, keep_best, run_pipeline
+
+
+def slow(seconds, fn=lambda item: item):
+    """A stage function that waits like a model or geocoding call would."""
+    def call(item):
+        time.sleep(seconds)
+        return fn(item)
+    return call
+
+
+def test_items_pass_through_every_stage():
+    results = run_pipeline(range(20), [
+        Stage("double", lambda item: item * 2, workers=3),
+        Stage("odd", lambda item: item + 1, workers=2),
+    ])
+    assert sorted(results) == [item * 2 + 1 for item in range(20)]
+
+
+def test_none_drops_the_item():
+    results = run_pipeline(range(10), [
+        Stage("evens", lambda item: item if item % 2 == 0 else None, workers=2),
+        Stage("identity", lambda item: item),
+    ])
+    assert sorted(results) == [0, 2, 4, 6, 8]
+
+
+def test_workers_overlap_slow_calls():
+    items = 40
+    latency = 0.05
+    start = time.monotonic()
+    results = run_pipeline(range(items), [
+        Stage("enrich", slow(latency), workers=8),
+        Stage("images", slow(latency / 2), workers=4),
+    ])
+    elapsed = time.monotonic() - start
+    assert sorted(results) == list(range(items))
+    # One worker per stage would take items * 1.5 * latency = 3s.
+    assert elapsed < items * latency / 2
+
+
+def test_slow_stage_holds_back_the_input():
+    queue_size = 2
+    produced = [0]
+    lead = []
+
+    def source():
+        for item in range(100):
+            produced[0] += 1
+            yield item
+
+    def consume(item):
+        time.sleep(0.002)
+        lead.append(produced[0] - item)
+        return item
+
+    run_pipeline(source(), [
+        Stage("fast", lambda item: item, workers=1),
+        Stage("slow", consume, workers=1),
+    ], queue_size=queue_size)
+
+    # Only the bounded queues and the items in workers' hands can be ahead
+    # of the slow stage, never the whole input.
+    assert max(lead) <= 2 * queue_size + 3
+
+
+def test_stage_errors_are_counted():
+    def flaky(item):
+        if item % 3 == 0:
+            raise ValueError("model timed out")
+        return item
+
+    enrich = Stage("enrich", flaky, workers=4)
+    with pytest.warns(UserWarning):
+        results = run_pipeline(range(9), [enrich, Stage("insert", lambda item: item)])
+    assert sorted(results) == [1, 2, 4, 5, 7, 8]
+    assert enrich.errors == 3
+
+
+def test_permanent_errors_are_rejected_and_recorded(tmp_path):
+    rejected_path = tmp_path / "rejected.jsonl"
+
+    def geocode(item):
+        if item == 4:
+            raise PermanentError("ZERO_RESULTS")
+        if item == 7:
+            raise ConnectionError("geocoder unreachable")
+        return item
+
+    enrich = Stage("enrich", geocode, workers=3, rejected_path=str(rejected_path))
+    with pytest.warns(UserWarning):
+        results = run_pipeline(range(10), [enrich])
+    assert sorted(results) == [0, 1, 2, 3, 5, 6, 8, 9]
+    # Only the transient failure is left for a retry.
+    assert (enrich.errors, enrich.rejected) == (1, 1)
+    recorded = [json.loads(line) for line in rejected_path.read_text().splitlines()]
+    assert recorded == [{"stage": "enrich", "item": 4, "error": "ZERO_RESULTS"}]
+
+
+def test_input_error_is_raised_after_draining():
+    seen = []
+    lock = threading.Lock()
+
+    def source():
+        yield 10
+        yield 20
+        raise ConnectionError("archive download reset")
+
+    def record(item):
+        with lock:
+            seen.append(item)
+        return item
+
+    with pytest.raises(ConnectionError):
+        run_pipeline(source(), [Stage("parse", record, workers=2)])
+    # What was read before the failure still went through.
+    assert sorted(seen) == [10, 20]
+
+
+def test_keep_best_keeps_lowest_rank_in_first_seen_order():
+    items = [("b", 3), ("a", 2), ("b", 1), ("c", 5), ("a", 4)]
+    best = keep_best(items, key=lambda item: item[0], rank=lambda item: item[1])
+    assert best == [("b", 1), ("a", 2), ("c", 5)]
+
+
+def test_best_so_far_streams_duplicates_out():
+    dedup = best_so_far(key=lambda item: item[0], rank=lambda item: item[1])
+    items = [("a", 2), ("b", 5), ("a", 3), ("a", 2), ("b", 4), ("c", 1)]
+    # Later, worse copies are dropped; a later, better one still goes through.
+    assert [item for item in items if dedup(item) is not None] == [("a", 2), ("b", 5), ("b", 4), ("c", 1)]
+
+
+def test_best_so_far_as_a_stage_matches_keep_best_on_ordered_input():
+    items = [(f"subject {number % 7}", number) for number in range(50)]
+    results = run_pipeline(items, [
+        Stage("parse", lambda item: item, workers=1),
+        Stage("dedup", best_so_far(key=lambda item: item[0], rank=lambda item: item[1])),
+    ])
+    assert sorted(results) == sorted(keep_best(items, key=lambda item: item[0], rank=lambda item: item[1]))
@@ -0,0 +1,133 @@
+"""
+remove_duplicate_subjects and the listener's dedup stage on real Date
+headers, and a 50,000-message run against the pairwise comparison it replaced. Run with -s for the numbers:
+
+    python -m pytest -s backend/tests/test_remove_duplicate_subjects.py
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+from pipeline import Stage, run_pipeline
+from utils import Email, duplicate_message_filter, message_headers, remove_duplicate_subjects
+
+MESSAGES = 50_000
+
+
+def email(subject, date):
+    return Email(subject, "seller@mit.edu", date, "", None, "reuse", None)
+
+
+def old_remove_duplicate_subjects(emails):
+    """The version before keep_best: every email against every other, by date string."""
+    unique_emails = []
+    for email in emails:
+        is_duplicate = False
+        for other_email in emails:
+            if email.subject == other_email.subject and email.date > other_email.date:
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            unique_emails.append(email)
+    return unique_emails
+
+
+@pytest.mark.parametrize("earliest, later", [
+    # Day boundary: as strings "Sun, 1 Sep" > "Mon, 2 Sep", so the old version kept the later copy.
+    ("Sun, 1 Sep 2024 23:30:00 -0400", "Mon, 2 Sep 2024 09:00:00 -0400"),
+    # Month boundary.
+    ("Mon, 30 Sep 2024 18:00:00 -0400", "Tue, 1 Oct 2024 08:00:00 -0400"),
+    # Year boundary.
+    ("Tue, 31 Dec 2024 22:00:00 -0500", "Wed, 1 Jan 2025 10:00:00 -0500"),
+    # Same instant order across offsets: 01:00 UTC is before 23:30 -0400 (03:30 UTC).
+    ("Tue, 1 Oct 2024 01:00:00 +0000", "Mon, 30 Sep 2024 23:30:00 -0400"),
+    # Mailman's archive format next to a Date header.
+    ("Thursday, September 12, 2024 at 3:52PM", "Fri, 13 Sep 2024 08:00:00 -0400"),
+])
+def test_earliest_copy_wins(earliest, later):
+    for emails in ([email("Free desk", later), email("Free desk", earliest)],
+                   [email("Free desk", earliest), email("Free desk", later)]):
+        assert [kept.date for kept in remove_duplicate_subjects(emails)] == [earliest]
+
+
+def test_subjects_match_ignoring_case_and_spacing():
+    emails = [email("Free  Desk ", "Mon, 2 Sep 2024 09:00:00 -0400"),
+              email("free desk", "Sun, 1 Sep 2024 09:00:00 -0400"),
+              email("Free chair", "Mon, 2 Sep 2024 09:00:00 -0400")]
+    assert [kept.subject for kept in remove_duplicate_subjects(emails)] == ["free desk", "Free chair"]
+
+
+def test_unparseable_date_loses():
+    with pytest.warns(UserWarning):
+        kept = remove_duplicate_subjects([email("Lamp", "sometime last week"),
+                                          email("Lamp", "Mon, 2 Sep 2024 09:00:00 -0400")])
+    assert [copy.date for copy in kept] == ["Mon, 2 Sep 2024 09:00:00 -0400"]
+
+
+def raw(subject, date, body="Come grab it."):
+    return f"From: seller at mit.edu (Seller)\nDate: {date}\nSubject: [Reuse] {subject}\n\n{body}\nSubject: not a header"
+
+
+def test_message_headers():
+    assert message_headers(raw("Free desk", "Sun, 1 Sep 2024 23:30:00 -0400")) == (
+        "Free desk", "Sun, 1 Sep 2024 23:30:00 -0400")
+    assert message_headers("\nsome leftover digest text\n") == (None, None)
+
+
+def test_dedup_ahead_of_parallel_parse_is_deterministic():
+    messages = list(enumerate([
+        raw("Free desk", "Mon, 2 Sep 2024 09:00:00 -0400"),
+        raw("Free chair", "Mon, 2 Sep 2024 09:05:00 -0400"),
+        raw("free  desk", "Mon, 2 Sep 2024 10:00:00 -0400"),
+        "leftover text with no headers",
+        raw("Free chair", "Sun, 1 Sep 2024 12:00:00 -0400"),
+        raw("Free desk", "Tue, 3 Sep 2024 09:00:00 -0400"),
+    ]))
+
+    def parse(message):
+        time.sleep(random.random() / 100)
+        return message[0]
+
+    runs = {frozenset(run_pipeline(messages, [Stage("dedup", duplicate_message_filter()),
+                                              Stage("parse", parse, workers=4)]))
+            for _ in range(10)}
+    # The earlier chair repost still goes through: it beats the copy already passed on.
+    assert runs == {frozenset({0, 1, 3, 4})}
+
+
+def make_emails(count):
+    """A month of list traffic: each subject posted twice, the repost a day later."""
+    start = datetime(2024, 9, 1, tzinfo=timezone(timedelta(hours=-4)))
+    emails = []
+    for number in range(count // 2):
+        posted = start + timedelta(minutes=number)
+        for date in (posted + timedelta(days=1), posted):
+            emails.append(email(f"Item {number}", date.strftime("%a, %-d %b %Y %H:%M:%S %z")))
+    return emails
+
+
+def seconds(dedup, emails):
+    start = time.perf_counter()
+    result = dedup(emails)
+    return time.perf_counter() - start, result
+
+
+def test_fifty_thousand_messages():
+    emails = make_emails(MESSAGES)
+    elapsed, kept = seconds(remove_duplicate_subjects, emails)
+    assert len(kept) == MESSAGES // 2
+    assert all(copy.date == emails[number * 2 + 1].date for number, copy in enumerate(kept))
+
+    # The pairwise version is quadratic, so time it on a slice and scale up.
+    sample = emails[:2000]
+    old_elapsed, _ = seconds(old_remove_duplicate_subjects, sample)
+    new_elapsed, _ = seconds(remove_duplicate_subjects, sample)
+    print(f"\n{MESSAGES} messages: {elapsed:.2f}s with keep_best")
+    print(f"{len(sample)} messages: {old_elapsed:.3f}s pairwise, {new_elapsed:.3f}s with keep_best "
+          f"(pairwise on {MESSAGES} would be about {old_elapsed * (MESSAGES / len(sample)) ** 2:.0f}s)")
+    assert elapsed < 30
@@ -0,0 +1,58 @@
+"""
+Concurrent handler throughput with queries run on the event loop (as
+handlers did before repository.execute) and off it.
+
+The stand-in query sleeps for QUERY_LATENCY in execute(), like a blocking
+PostgREST round trip. Run with -s to see the numbers:
+
+    python -m pytest -s backend/tests/test_repository_benchmark.py
+"""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("anyio")
+pytest.importorskip("supabase")
+
+from backend import repository
+
+QUERY_LATENCY = 0.02
+REQUESTS = 200
+
+
+class SlowQuery:
+    def execute(self):
+        time.sleep(QUERY_LATENCY)
+        return {"data": []}
+
+
+async def blocking_handler():
+    # Before: handlers called .execute() directly inside the coroutine.
+    return SlowQuery().execute()
+
+
+async def offloaded_handler():
+    return await repository.execute(SlowQuery())
+
+
+def requests_per_second(handler, requests=REQUESTS) -> float:
+    async def burst():
+        start = time.perf_counter()
+        await asyncio.gather(*(handler() for _ in range(requests)))
+        return time.perf_counter() - start
+
+    # The capacity limiter belongs to the loop that created it.
+    repository._limiter = None
+    return requests / asyncio.run(burst())
+
+
+def test_offloaded_queries_overlap():
+    before = requests_per_second(blocking_handler)
+    after = requests_per_second(offloaded_handler)
+    print(f"\n{REQUESTS} concurrent requests, {QUERY_LATENCY * 1000:.0f} ms per query: "
+          f"{before:.0f} req/s on the event loop, {after:.0f} req/s off it "
+          f"(DB_MAX_CONCURRENCY={repository.DB_MAX_CONCURRENCY})")
+    # On the loop, requests run one at a time: at most 1 / QUERY_LATENCY per second.
+    assert before <= 1.1 / QUERY_LATENCY
+    assert after > 3 * before
@@ -0,0 +1,100 @@
+"""_search_page against a stand-in PostgREST query builder."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend import main
+from backend.repository import encode_cursor
+
+ROWS = [
+    {"id": f"{number:04d}", "created_at": f"2024-09-{number + 1:02d}T00:00:00+00:00", "name": f"Lamp {number}"}
+    for number in range(25)
+]
+
+
+class FakeQuery:
+    """Applies the filters the search uses to ROWS; ``count`` counts what matches."""
+
+    def __init__(self, count=None):
+        self.count_method = count
+        self.filters = []
+        self.limit_rows = None
+        self.desc = False
+
+    def select(self, columns, count=None):
+        return FakeQuery(count)
+
+    def ilike(self, column, pattern):
+        needle = pattern.strip("%").lower()
+        self.filters.append(lambda row: needle in row[column].lower())
+        return self
+
+    def order(self, column, desc=False):
+        self.desc = desc
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row[column] <= value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def or_(self, condition):
+        created_at = condition.split('"')[1]
+        row_id = condition.split('"')[5]
+        self.filters.append(lambda row: (row["created_at"], row["id"]) < (created_at, row_id))
+        return self
+
+    def limit(self, rows):
+        self.limit_rows = rows
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_rows = start, end - start + 1
+        return self
+
+    def run(self):
+        rows = [row for row in ROWS if all(check(row) for check in self.filters)]
+        rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=self.desc)
+        count = len(rows) if self.count_method else None
+        offset = getattr(self, "offset", 0)
+        return type("Response", (), {"data": rows[offset:offset + self.limit_rows], "count": count})()
+
+
+@pytest.fixture(autouse=True)
+def fake_database(monkeypatch):
+    monkeypatch.setattr(main.supabase, "table", lambda name: FakeQuery())
+
+    async def execute(query):
+        return query.run()
+
+    monkeypatch.setattr(main, "execute", execute)
+
+
+def test_count_stays_the_same_on_every_keyset_page():
+    async def walk():
+        counts, names, cursor = [], [], ""
+        while cursor is not None:
+            rows, cursor, count = await main._search_page("lamp", 1, 10, cursor, with_count=True)
+            counts.append(count)
+            names += [row["name"] for row in rows]
+        return counts, names
+
+    counts, names = asyncio.run(walk())
+    assert counts == [25, 25, 25]
+    assert names == [f"Lamp {number}" for number in reversed(range(25))]
+
+
+def test_offset_pages_count_in_the_same_query():
+    rows, _, count = asyncio.run(main._search_page("lamp", 2, 10, None, with_count=True))
+    assert [row["name"] for row in rows] == [f"Lamp {number}" for number in range(14, 4, -1)]
+    assert count == 25
+
+
+def test_cursor_is_where_the_page_ended():
+    rows, cursor, _ = asyncio.run(main._search_page("", 1, 10, ""))
+    assert cursor == encode_cursor(rows[-1])
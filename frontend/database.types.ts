@@ -62,6 +62,7 @@ export type Database = {
           name: string
           other_urls: string[] | null
           photo_urls: string[] | null
+          photo_variants: Json
           quality: string | null
           seller_id: string | null
           tags: string[] | null
@@ -79,6 +80,7 @@ export type Database = {
           name: string
           other_urls?: string[] | null
           photo_urls?: string[] | null
+          photo_variants?: Json
           quality?: string | null
           seller_id?: string | null
           tags?: string[] | null
@@ -96,6 +98,7 @@ export type Database = {
           name?: string
           other_urls?: string[] | null
           photo_urls?: string[] | null
+          photo_variants?: Json
           quality?: string | null
           seller_id?: string | null
           tags?: string[] | null
@@ -20,7 +20,9 @@ export default function Browse() {
   const [pageCount, setPageCount] = useState<number>(1);
   const [items, setItems] = useState<Tables<'items'>[]>([]);
   const [loading, setLoading] = useState<boolean>(false);
-  const [sellers, setSellers] = useState<(Tables<'users'> | undefined)[]>([]);
+  const [sellers, setSellers] = useState<Record<string, Tables<'users'>>>(
+    {},
+  );
 
   const params = new URLSearchParams(location.search);
   const page = parseInt(params.get('page') || '1') || 1;
@@ -29,19 +31,18 @@ export default function Browse() {
   useEffect(() => {
     // implement logic to fetch the API for relevant queries and return the answer.
     setLoading(true);
-    Promise.all([
-      get('/api/get-number-of-pages', {
-        name: searchQuery,
-      }),
-      get('/api/search-items-by-name', {
-        name: searchQuery,
-        page: page,
-      }),
-    ])
-      .then(([page_result, items_result]) => {
+    get('/api/search-items', {
+      name: searchQuery,
+      page: page,
+      ranked: !!searchQuery,
+      photo_size: 'medium',
+      include: 'seller',
+    })
+      .then((result) => {
         setLoading(false);
-        setPageCount(page_result.data.total_pages);
-        setItems(items_result.data);
+        setPageCount(result.data.total_pages);
+        setItems(result.data.items);
+        setSellers(result.data.sellers || {});
       })
       .catch((e) => {
         setLoading(false);
@@ -49,18 +50,6 @@ export default function Browse() {
       });
   }, [location]);
 
-  useEffect(() => {
-    Promise.all(
-      items.map((item) =>
-        item.seller_id
-          ? get('/api/get-user/' + (item.seller_id || ''))
-          : new Promise((resolve, _) => resolve(undefined)),
-      ),
-    ).then((result) => {
-      setSellers(result.map((seller) => seller?.data));
-    });
-  }, [items]);
-
   return (
     <div className="text-pine-900">
       <h1 className="mb-4 text-3xl">browse listings</h1>
@@ -77,7 +66,7 @@ export default function Browse() {
           </div>
         ) : (
           <div className="mt-6 grid grid-cols-2 gap-3 md:grid-cols-4">
-            {items.map((item, idx) => (
+            {items.map((item) => (
               <div
                 className="my-2 w-full cursor-pointer overflow-clip duration-200 hover:scale-105"
                 onClick={() => navigate('/item/' + item.id)}
@@ -95,11 +84,12 @@ export default function Browse() {
                   <MapPin className="shrink-0" size={16} />
                   <span>{item.location}</span>
                 </p>
-                {sellers[idx] && (
+                {item.seller_id && sellers[item.seller_id] && (
                   <p className="flex items-start gap-2 text-sm">
                     <Star className="mt-0.5 shrink-0" size={16} />
                     <span>
-                      seller has <strong>{sellers[idx].karma || 0}</strong>{' '}
+                      seller has{' '}
+                      <strong>{sellers[item.seller_id].karma || 0}</strong>{' '}
                       karma
                     </span>
                   </p>
@@ -39,13 +39,27 @@ export default function SingleItem() {
   const [photoIndex, setPhotoIndex] = useState<number>(0);
   const location = useLocation();
 
+  type ItemDetail = {
+    item: Tables<'items'>;
+    seller: Tables<'users'> | null;
+    bids: (Tables<'bids'> & { bidder: Tables<'users'> | null })[] | null;
+  };
+
+  // The item, its seller, its bids and their bidders all come from one call.
+  const loadDetail = () =>
+    get('/api/item-detail/' + (uuid || '')).then((data) => {
+      const detail: ItemDetail = data.data;
+      const itemBids = detail.bids || [];
+      setItem(detail.item);
+      setSeller(detail.seller || undefined);
+      setBids(itemBids);
+      setBidUsers(itemBids.map((bid) => bid.bidder || undefined));
+    });
+
   useEffect(() => {
     setLoading(true);
-    get('/api/get-item/' + (uuid || ''))
-      .then((data) => {
-        setItem(data.data);
-        setLoading(false);
-      })
+    loadDetail()
+      .then(() => setLoading(false))
       .catch((e) => {
         setLoading(false);
         if (/404/.test(e)) {
@@ -58,54 +72,27 @@ export default function SingleItem() {
   }, [location]);
 
   useEffect(() => {
-    if (!item || !item.seller_id) return;
-    setLoading(true);
-    get('/api/get-user/' + item.seller_id)
-      .then((data) => {
-        setSeller(data.data);
-        setLoading(false);
-      })
-      .catch((e) => {
-        setLoading(false);
-        alert(e);
-      });
-  }, [item]);
-
-  useEffect(() => {
-    if (!item || !item.seller_id) return;
-    setLoading(true);
-    get('/api/get-bids-for-item/' + item.id)
-      .then((data) => {
-        setBids(data.data);
-        setLoading(false);
-      })
-      .catch((e) => {
-        setLoading(false);
-        alert(e);
-      });
-  }, [item]);
-
-  useEffect(() => {
-    get('/api/get-multiple-users', { userids: bids.map((x) => x.bidder_id) })
-      .then((resp) => setBidUsers(resp.data))
-      .catch(alert);
-  }, [bids]);
+    if (!item) return;
+    // Refresh bids when they change instead of polling for them.
+    const events = new EventSource(
+      '/api/events?item_ids=' + encodeURIComponent(item.id),
+    );
+    const refresh = () => loadDetail().catch(console.log);
+    ['bid-created', 'bid-cancelled', 'bid-accepted', 'lagged'].forEach(
+      (type) => events.addEventListener(type, refresh),
+    );
+    return () => events.close();
+  }, [item?.id]);
 
   const toggleBid = () => {
     if (!user || !item) return;
-    if (bids.find((x) => x.bidder_id === user.id) !== undefined) {
-      post('/api/cancel-bid/' + item.id, {})
-        .then((resp) => {
-          setBids(resp.data);
-        })
-        .catch(alert);
-    } else {
-      post('/api/bid-for-item/' + item.id, {})
-        .then((resp) => {
-          setBids(resp.data);
-        })
-        .catch(alert);
-    }
+    const endpoint =
+      bids.find((x) => x.bidder_id === user.id) !== undefined
+        ? '/api/cancel-bid/'
+        : '/api/bid-for-item/';
+    post(endpoint + item.id, {})
+      .then(() => loadDetail())
+      .catch(alert);
   };
 
   const acceptBid = (bid: Tables<'bids'>) => {
@@ -125,6 +112,9 @@ export default function SingleItem() {
 
   const [rating, setRating] = useState<number>(3);
 
+  const photoVariants =
+    (item?.photo_variants as Record<string, string>[] | undefined) || [];
+
   return item ? (
     <>
       {item.photo_urls && (
@@ -137,7 +127,7 @@ export default function SingleItem() {
             {item.photo_urls.map((photo, index) => (
               <img
                 onClick={() => setPhotoIndex(index)}
-                src={photo}
+                src={photoVariants[index]?.small || photo}
                 className={
                   'h-10 w-10 cursor-pointer rounded-lg object-cover' +
                   ' ' +
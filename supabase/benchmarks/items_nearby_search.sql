@@ -0,0 +1,88 @@
+-- Nearby search (search-items-near) on 100k synthetic items, in radius and
+-- k-nearest mode, with and without items_earth_location_idx.
+--
+--     psql "$DATABASE_URL" -f supabase/benchmarks/items_nearby_search.sql
+--
+-- Runs in a transaction that is rolled back, so the seeded rows never stay.
+-- Both modes should show an Index Scan (or Bitmap Index Scan) on
+-- items_earth_location_idx; the last two plans have index scans turned off
+-- to show the sequential scan it replaces.
+--
+-- The queries are the body of search_items_near with the arguments filled
+-- in. The function itself isn't inlined (it sets search_path), so EXPLAIN on
+-- the call would only show a Function Scan.
+
+\timing on
+begin;
+
+set local search_path = public, extensions;
+
+-- Items scattered within about 5 km of Kresge (42.3582, -71.0956); one in
+-- ten has no location.
+insert into items (name, gis_location, created_at)
+select 'Item ' || n,
+       case when n % 10 = 0 then null
+            else array[42.3582 + (random() - 0.5) * 0.09, -71.0956 + (random() - 0.5) * 0.12]
+       end,
+       now() - (n || ' minutes')::interval
+from generate_series(1, 100000) as n;
+
+analyze items;
+
+-- Radius mode: within 500 m, nearest first.
+explain (analyze, buffers)
+select i as item,
+       earth_distance(items_earth_location(i.gis_location[1], i.gis_location[2]),
+                      ll_to_earth(42.3601, -71.0942)) as distance_meters
+from items i
+where i.gis_location is not null
+  and earth_box(ll_to_earth(42.3601, -71.0942), 500)
+      @> items_earth_location(i.gis_location[1], i.gis_location[2])
+  and earth_distance(items_earth_location(i.gis_location[1], i.gis_location[2]),
+                     ll_to_earth(42.3601, -71.0942)) <= 500
+order by items_earth_location(i.gis_location[1], i.gis_location[2]) <-> ll_to_earth(42.3601, -71.0942),
+         i.id
+limit 10;
+
+-- k mode: the 10 nearest, with the box spanning the whole earth.
+explain (analyze, buffers)
+select i as item,
+       earth_distance(items_earth_location(i.gis_location[1], i.gis_location[2]),
+                      ll_to_earth(42.3601, -71.0942)) as distance_meters
+from items i
+where i.gis_location is not null
+  and earth_box(ll_to_earth(42.3601, -71.0942), 20037509)
+      @> items_earth_location(i.gis_location[1], i.gis_location[2])
+order by items_earth_location(i.gis_location[1], i.gis_location[2]) <-> ll_to_earth(42.3601, -71.0942),
+         i.id
+limit 10;
+
+select (r.item).name, round(r.distance_meters) as metres
+from search_items_near(42.3601, -71.0942, 500) r;
+
+set local enable_indexscan = off;
+set local enable_bitmapscan = off;
+
+explain (analyze, buffers)
+select i as item
+from items i
+where i.gis_location is not null
+  and earth_box(ll_to_earth(42.3601, -71.0942), 500)
+      @> items_earth_location(i.gis_location[1], i.gis_location[2])
+  and earth_distance(items_earth_location(i.gis_location[1], i.gis_location[2]),
+                     ll_to_earth(42.3601, -71.0942)) <= 500
+order by items_earth_location(i.gis_location[1], i.gis_location[2]) <-> ll_to_earth(42.3601, -71.0942),
+         i.id
+limit 10;
+
+explain (analyze, buffers)
+select i as item
+from items i
+where i.gis_location is not null
+  and earth_box(ll_to_earth(42.3601, -71.0942), 20037509)
+      @> items_earth_location(i.gis_location[1], i.gis_location[2])
+order by items_earth_location(i.gis_location[1], i.gis_location[2]) <-> ll_to_earth(42.3601, -71.0942),
+         i.id
+limit 10;
+
+rollback;
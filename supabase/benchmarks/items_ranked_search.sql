@@ -0,0 +1,71 @@
+-- Ranked search (search-items-by-name?ranked=true) against the ilike scan it
+-- replaces, on 100k synthetic items.
+--
+--     psql "$DATABASE_URL" -f supabase/benchmarks/items_ranked_search.sql
+--
+-- Runs in a transaction that is rolled back, so the seeded rows never stay.
+-- Compare the plans and "Execution Time" lines: the ilike queries scan every
+-- row, the ranked ones go through items_search_vector_idx and
+-- items_name_trgm_idx.
+
+\timing on
+begin;
+
+set local search_path = public, extensions;
+
+insert into items (name, description, tags, created_at)
+select adjective || ' ' || noun,
+       'Gently used ' || lower(noun) || ', pick up at building ' || (n % 70 + 1) || '.',
+       array[lower(noun), lower(adjective)],
+       now() - (n || ' minutes')::interval
+from generate_series(1, 100000) as n,
+     lateral (select (array['Red', 'Wooden', 'Vintage', 'Small', 'Large', 'Ergonomic', 'Broken', 'Spare', 'Foldable', 'Glass'])[n % 10 + 1] as adjective) a,
+     lateral (select (array['Desk Lamp', 'Office Chair', 'Bookshelf', 'Monitor', 'Couch', 'Mini Fridge', 'Whiteboard', 'Microwave', 'Bike Helmet', 'Coffee Maker', 'Filing Cabinet', 'Textbook', 'Standing Desk'])[(n / 10) % 13 + 1] || ' ' || (n % 997) as noun) b;
+
+analyze items;
+
+-- What search-items-by-name ran before: a substring match on the name only.
+explain (analyze, buffers)
+select * from items
+where name ilike '%bookshelf%'
+order by created_at desc, id desc
+limit 10;
+
+select count(*) as ilike_matches from items where name ilike '%bookshelf%';
+
+-- The body of search_items('bookshelf'); the function itself isn't inlined
+-- (it sets search_path), so EXPLAIN on the call would only show a Function Scan.
+explain (analyze, buffers)
+select i.*
+from items i,
+     websearch_to_tsquery('english', 'bookshelf') q
+where items_search_vector(i.name, i.description, i.tags) @@ q
+   or 'bookshelf' <% i.name
+order by ts_rank_cd(items_search_vector(i.name, i.description, i.tags), q)
+         + word_similarity('bookshelf', i.name) desc,
+         i.created_at desc,
+         i.id desc
+limit 10;
+
+-- A misspelling: ilike finds nothing, the trigram match still does.
+select count(*) as ilike_matches from items where name ilike '%bokshelf%';
+
+explain (analyze, buffers)
+select i.*
+from items i,
+     websearch_to_tsquery('english', 'bokshelf') q
+where items_search_vector(i.name, i.description, i.tags) @@ q
+   or 'bokshelf' <% i.name
+order by ts_rank_cd(items_search_vector(i.name, i.description, i.tags), q)
+         + word_similarity('bokshelf', i.name) desc,
+         i.created_at desc,
+         i.id desc
+limit 10;
+
+-- The count the combined page+count endpoint adds.
+explain (analyze, buffers)
+select count_search_items('bookshelf');
+
+select * from search_items('bokshelf', 5);
+
+rollback;
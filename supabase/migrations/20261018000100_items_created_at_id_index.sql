@@ -0,0 +1,3 @@
+-- Keyset pagination for search-items-by-name seeks on (created_at, id).
+create index if not exists items_created_at_id_idx
+    on public.items (created_at desc, id desc);
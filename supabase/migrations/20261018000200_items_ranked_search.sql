@@ -0,0 +1,64 @@
+-- Ranked, typo-tolerant item search for search-items-by-name?ranked=true.
+--
+-- A leading-wildcard ilike cannot use a btree index and only looks at the
+-- name. Instead, a full-text document over name, tags and description is
+-- matched through a GIN expression index, and trigram similarity on the name
+-- catches misspellings. Results are ordered by relevance.
+
+create extension if not exists pg_trgm with schema extensions;
+
+-- array_to_string is only STABLE, so wrap it to make it usable in an index.
+create or replace function public.items_search_vector(name text, description text, tags text[])
+returns tsvector
+language sql
+immutable
+parallel safe
+as $$
+  select setweight(to_tsvector('english', coalesce(name, '')), 'A')
+      || setweight(to_tsvector('english', coalesce(array_to_string(tags, ' '), '')), 'B')
+      || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+$$;
+
+create index if not exists items_search_vector_idx
+    on public.items
+    using gin (public.items_search_vector(name, description, tags));
+
+create index if not exists items_name_trgm_idx
+    on public.items
+    using gin (name extensions.gin_trgm_ops);
+
+create or replace function public.search_items(
+    search_query text,
+    page_limit integer default 10,
+    page_offset integer default 0
+)
+returns setof public.items
+language sql
+stable
+set search_path = public, extensions
+as $$
+  select i.*
+  from items i,
+       websearch_to_tsquery('english', search_query) q
+  where items_search_vector(i.name, i.description, i.tags) @@ q
+     or search_query <% i.name
+  order by ts_rank_cd(items_search_vector(i.name, i.description, i.tags), q)
+           + word_similarity(search_query, i.name) desc,
+           i.created_at desc,
+           i.id desc
+  limit page_limit
+  offset page_offset
+$$;
+
+create or replace function public.count_search_items(search_query text)
+returns bigint
+language sql
+stable
+set search_path = public, extensions
+as $$
+  select count(*)
+  from items i,
+       websearch_to_tsquery('english', search_query) q
+  where items_search_vector(i.name, i.description, i.tags) @@ q
+     or search_query <% i.name
+$$;
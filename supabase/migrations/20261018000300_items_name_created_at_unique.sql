@@ -0,0 +1,30 @@
+-- Backstop for the listener's in-memory duplicate check: the same post can
+-- never be stored twice.
+
+-- Existing duplicates collapse onto the copy with the lowest id. Bids and
+-- transactions on the other copies move over to it first, so nothing that
+-- references them is lost or blocks the delete.
+create temporary table items_duplicates as
+select id, first_value(id) over (partition by name, created_at order by id) as keep_id
+from public.items;
+
+delete from items_duplicates where id = keep_id;
+
+update public.bids
+set item_id = items_duplicates.keep_id
+from items_duplicates
+where bids.item_id = items_duplicates.id;
+
+update public.transactions
+set item_id = items_duplicates.keep_id
+from items_duplicates
+where transactions.item_id = items_duplicates.id;
+
+delete from public.items
+using items_duplicates
+where items.id = items_duplicates.id;
+
+drop table items_duplicates;
+
+create unique index if not exists items_name_created_at_key
+    on public.items (name, created_at);
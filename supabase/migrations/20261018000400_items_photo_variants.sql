@@ -0,0 +1,5 @@
+-- Resized copies of each photo, in the same order as photo_urls:
+-- [{"small": url, "medium": url, "large": url}, ...]. Empty until the
+-- listener or backfill_photo_variants.py has produced them.
+alter table public.items
+    add column if not exists photo_variants jsonb not null default '[]'::jsonb;
@@ -0,0 +1,62 @@
+-- Nearby-item search for /search-items-near.
+--
+-- gis_location is a plain [lat, lng] array. earthdistance turns it into a
+-- point on the earth's surface, and a GiST index over that expression
+-- answers both "within r metres" (an earth_box containment check) and
+-- "k nearest" (ordering by the <-> distance operator) without scanning
+-- every item.
+
+create extension if not exists cube with schema extensions;
+create extension if not exists earthdistance with schema extensions;
+
+-- earthdistance's own functions resolve cube and earth() through the
+-- search_path, so pin it here to make the expression safe to index.
+create or replace function public.items_earth_location(lat double precision, lng double precision)
+returns extensions.earth
+language sql
+immutable
+strict
+parallel safe
+set search_path = public, extensions
+as $$
+  select ll_to_earth(lat, lng)
+$$;
+
+create index if not exists items_earth_location_idx
+    on public.items
+    using gist (public.items_earth_location(gis_location[1], gis_location[2]))
+    where gis_location is not null;
+
+-- Items nearest to (lat, lng) first, optionally only those within
+-- radius_meters and with a name containing name_query. Without a radius
+-- the box spans the whole earth, so the same index condition applies to
+-- both modes.
+create or replace function public.search_items_near(
+    lat double precision,
+    lng double precision,
+    radius_meters double precision default null,
+    name_query text default '',
+    page_limit integer default 10,
+    page_offset integer default 0
+)
+returns table (item public.items, distance_meters double precision)
+language sql
+stable
+set search_path = public, extensions
+as $$
+  select i as item,
+         earth_distance(items_earth_location(i.gis_location[1], i.gis_location[2]),
+                        ll_to_earth(lat, lng)) as distance_meters
+  from items i
+  where i.gis_location is not null
+    and earth_box(ll_to_earth(lat, lng), coalesce(radius_meters, 20037509))
+        @> items_earth_location(i.gis_location[1], i.gis_location[2])
+    and (radius_meters is null
+         or earth_distance(items_earth_location(i.gis_location[1], i.gis_location[2]),
+                           ll_to_earth(lat, lng)) <= radius_meters)
+    and (name_query = '' or i.name ilike '%' || name_query || '%')
+  order by items_earth_location(i.gis_location[1], i.gis_location[2]) <-> ll_to_earth(lat, lng),
+           i.id
+  limit page_limit
+  offset page_offset
+$$;